@@ -0,0 +1,168 @@
+"""Benchmarks for the PDF to Structured DOCX Converter
+
+    python benchmark.py startup [--exe dist/process/process.exe] [--runs 5]
+    python benchmark.py reflow act1.pdf act2.pdf ...
+    python benchmark.py packaging [--runs 3] act1.pdf act2.pdf ...
+
+Results are appended to benchmark_history.json together with the converter
+version, so they can be compared across releases.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(HERE, "benchmark_history.json")
+
+def get_app_version():
+    """Read the converter version without importing anything heavy"""
+    sys.path.insert(0, HERE)
+    import process
+    return process.APP_VERSION
+
+def record_result(name, results):
+    """Append a benchmark result to the history file"""
+    history = []
+    if os.path.exists(HISTORY_PATH):
+        with open(HISTORY_PATH, 'r') as f:
+            history = json.load(f)
+    history.append({
+        "benchmark": name,
+        "version": get_app_version(),
+        "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    })
+    with open(HISTORY_PATH, 'w') as f:
+        json.dump(history, f, indent=4)
+
+def measure_import_time():
+    """Seconds to import the converter module in a fresh interpreter"""
+    code = ("import sys, time; sys.path.insert(0, %r); started = time.perf_counter(); "
+            "import process; print(time.perf_counter() - started)" % HERE)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=HERE)
+    return float(output.stdout.strip())
+
+def measure_time_to_window(command):
+    """Seconds from launching the application until its window is ready"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        probe_path = os.path.join(temp_dir, "startup_probe")
+        env = dict(os.environ, PDF_CONVERTER_STARTUP_PROBE=probe_path)
+        started = time.time()
+        subprocess.run(command, env=env, cwd=HERE, timeout=120, check=True)
+        with open(probe_path, 'r') as f:
+            return float(f.read()) - started
+
+def benchmark_startup(args):
+    """Measure import time and time-to-window, reporting medians"""
+    import_times = [measure_import_time() for _ in range(args.runs)]
+    command = [args.exe] if args.exe else [sys.executable, os.path.join(HERE, "process.py")]
+    window_times = [measure_time_to_window(command) for _ in range(args.runs)]
+    results = {
+        "runs": args.runs,
+        "import_seconds": statistics.median(import_times),
+        "time_to_window_seconds": statistics.median(window_times),
+        "launched": "packaged build" if args.exe else "python process.py"
+    }
+    print(f"Import time:    {results['import_seconds'] * 1000:.1f} ms (median of {args.runs})")
+    print(f"Time to window: {results['time_to_window_seconds'] * 1000:.1f} ms ({results['launched']})")
+    return results
+
+def measure_conversion(pdf_path, output_dir, reflow):
+    """Convert one PDF and measure time, paragraph count and output size"""
+    import process
+    from docx import Document
+    started = time.perf_counter()
+    output_path, status_msg, doc_stats = process.convert_pdf_to_docx(pdf_path, output_dir, reflow=reflow)
+    convert_seconds = time.perf_counter() - started
+    if not output_path:
+        raise RuntimeError(f"Conversion of {pdf_path} failed: {status_msg}")
+    started = time.perf_counter()
+    process.verify_docx_integrity(output_path, doc_stats)
+    verify_seconds = time.perf_counter() - started
+    return {
+        "convert_seconds": convert_seconds,
+        "verify_seconds": verify_seconds,
+        "paragraphs": len(Document(output_path).paragraphs),
+        "output_bytes": os.path.getsize(output_path)
+    }
+
+def benchmark_reflow(args):
+    """Compare conversions with and without paragraph reflow"""
+    sys.path.insert(0, HERE)
+    results = {"files": []}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for pdf_path in args.pdfs:
+            line_per_paragraph = measure_conversion(pdf_path, os.path.join(temp_dir, "lines"), reflow=False)
+            reflowed = measure_conversion(pdf_path, os.path.join(temp_dir, "reflow"), reflow=True)
+            results["files"].append({"file": os.path.basename(pdf_path),
+                                     "without_reflow": line_per_paragraph, "with_reflow": reflowed})
+            print(f"{os.path.basename(pdf_path)}:")
+            for key in ("paragraphs", "output_bytes", "convert_seconds", "verify_seconds"):
+                before, after = line_per_paragraph[key], reflowed[key]
+                change = (after - before) / before * 100 if before else 0.0
+                print(f"  {key:16} {before:>12.3f} -> {after:>12.3f} ({change:+.1f}%)")
+    return results
+
+def benchmark_packaging(args):
+    """Compare DOCX size and packaging time at each compression level"""
+    sys.path.insert(0, HERE)
+    import io
+    import process
+    results = {"runs": args.runs, "files": []}
+    for pdf_path in args.pdfs:
+        doc, status_msg, _ = process.build_document(pdf_path)
+        if doc is None:
+            raise RuntimeError(f"Conversion of {pdf_path} failed: {status_msg}")
+        levels = {}
+        for level in process.DOCX_COMPRESSION_LEVELS:
+            runs = [process.package_docx(doc, level) for _ in range(args.runs)]
+            levels[level] = {"bytes": runs[0][1]["bytes"],
+                             "seconds": statistics.median(packaging["seconds"] for _, packaging in runs)}
+        # python-docx's own writer, for reference
+        save_times = []
+        for _ in range(args.runs):
+            buffer = io.BytesIO()
+            started = time.perf_counter()
+            doc.save(buffer)
+            save_times.append(time.perf_counter() - started)
+        levels["python-docx"] = {"bytes": len(buffer.getvalue()), "seconds": statistics.median(save_times)}
+        results["files"].append({"file": os.path.basename(pdf_path), "levels": levels})
+        
+        print(f"{os.path.basename(pdf_path)}:")
+        for level, numbers in levels.items():
+            print(f"  {level:12} {numbers['bytes']:>12,} bytes {numbers['seconds'] * 1000:>10.1f} ms")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Converter benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    startup = subparsers.add_parser("startup", help="import time and time-to-window")
+    startup.add_argument("--exe", help="packaged executable to launch instead of python process.py")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.set_defaults(run=benchmark_startup)
+    
+    reflow = subparsers.add_parser("reflow", help="paragraph count and conversion time with/without reflow")
+    reflow.add_argument("pdfs", nargs="+", help="PDF files to convert")
+    reflow.set_defaults(run=benchmark_reflow)
+    
+    packaging = subparsers.add_parser("packaging", help="DOCX size and packaging time per compression level")
+    packaging.add_argument("pdfs", nargs="+", help="PDF files to convert")
+    packaging.add_argument("--runs", type=int, default=3)
+    packaging.set_defaults(run=benchmark_packaging)
+    
+    args = parser.parse_args()
+    results = args.run(args)
+    record_result(args.benchmark, results)
+
+if __name__ == "__main__":
+    main()
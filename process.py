@@ -1,16 +1,20 @@
 import os
 import re
 import hashlib
+import html
+import io
+import struct
+import types
+import zlib
+import sqlite3
+import random
 import queue
 import threading
 import time
-import pdfplumber
-import tkinter as tk
-from tkinter import filedialog, messagebox, Listbox, Scrollbar, Frame, END, DISABLED, NORMAL
-from tkinter import ttk
-from docx import Document
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.shared import Inches, Pt
+import heapq
+import math
+import tempfile
+import collections
 import logging
 from datetime import datetime
 import json
@@ -19,17 +23,187 @@ import warnings
 import traceback
 import sys
 
+# pdfplumber, python-docx, tkinter and the service/metrics servers are imported
+# where they are first used, so importing this module stays fast and has no
+# side effects; the GUI is built by build_gui() from main().
+
 # Suppress pdfplumber warnings but keep critical ones
 warnings.filterwarnings("ignore", category=UserWarning, message="CropBox missing from /Page, defaulting to MediaBox")
 
+APP_VERSION = "2.0"
+
+# ---------------------------------------------------------------------------
+# Conversion queues: strict priorities, round robin between submitters
+# ---------------------------------------------------------------------------
+
+QUEUE_PRIORITIES = ("urgent", "normal", "bulk")  # Served strictly in this order
+
+queue_wait_lock = threading.Lock()
+queue_wait_stats = {}  # (queue name, priority) -> {"count", "total", "max"} seconds waited
+
+def record_queue_wait(queue_name, priority, seconds):
+    """Record how long an item waited in a queue before it was taken"""
+    metrics_observe("pdf_converter_queue_wait_seconds", seconds, queue=queue_name, priority=priority)
+    with queue_wait_lock:
+        stats = queue_wait_stats.setdefault((queue_name, priority), {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+def format_queue_wait_stats(queue_name):
+    """Describe the waits of each priority of a queue, one line per priority"""
+    with queue_wait_lock:
+        stats = {priority: dict(queue_wait_stats[(queue_name, priority)]) for priority in QUEUE_PRIORITIES
+                 if (queue_name, priority) in queue_wait_stats}
+    return [f"{priority}: {s['count']} taken, mean wait {format_duration(s['total'] / s['count'])}, "
+            f"longest {format_duration(s['max'])}" for priority, s in stats.items()]
+
+class FairQueueLanes:
+    """Deque stand-in for queue.Queue and asyncio.Queue that serves by priority
+
+    The queues append (item, priority, submitter) entries and popleft()
+    items. Priorities are served strictly in QUEUE_PRIORITIES order, and
+    within a priority the submitters take turns, one item each, so a big
+    batch cannot starve a small one. Items are taken one file at a time, so
+    an urgent file queued behind a backlog is the next one converted.
+    """
+    
+    def __init__(self, name):
+        self.name = name
+        # Priority -> submitter -> deque of (time queued, item), submitters in turn order
+        self.lanes = {priority: collections.OrderedDict() for priority in QUEUE_PRIORITIES}
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        """Queued items in the order they would be taken"""
+        for lane in self.lanes.values():
+            turns = [list(waiting) for waiting in lane.values()]
+            for i in range(max((len(waiting) for waiting in turns), default=0)):
+                yield from (waiting[i][1] for waiting in turns if i < len(waiting))
+    
+    def append(self, entry):
+        item, priority, submitter = entry
+        if priority not in self.lanes:
+            raise ValueError(f"Unknown priority {priority!r}, use one of {', '.join(QUEUE_PRIORITIES)}")
+        self.lanes[priority].setdefault(submitter, collections.deque()).append((time.time(), item))
+        self.count += 1
+    
+    def popleft(self):
+        for priority, lane in self.lanes.items():
+            if not lane:
+                continue
+            submitter, waiting = lane.popitem(last=False)
+            queued_at, item = waiting.popleft()
+            if waiting:
+                lane[submitter] = waiting  # To the back of the turn order
+            self.count -= 1
+            record_queue_wait(self.name, priority, time.time() - queued_at)
+            return item
+        raise IndexError("pop from an empty queue")
+    
+    def clear(self):
+        """Drop every queued item without recording waits; returns how many were dropped"""
+        dropped = self.count
+        for lane in self.lanes.values():
+            lane.clear()
+        self.count = 0
+        return dropped
+    
+    def reprioritize(self, match, priority):
+        """Move the queued items for which match(item) is true to priority; returns how many moved"""
+        moved = 0
+        for lane_priority, lane in self.lanes.items():
+            if lane_priority == priority:
+                continue
+            for submitter in list(lane):
+                keep = collections.deque()
+                for queued_at, item in lane[submitter]:
+                    if match(item):
+                        self.lanes[priority].setdefault(submitter, collections.deque()).append((queued_at, item))
+                        moved += 1
+                    else:
+                        keep.append((queued_at, item))
+                if keep:
+                    lane[submitter] = keep
+                else:
+                    del lane[submitter]
+        return moved
+
+class FairPriorityQueue(queue.Queue):
+    """Thread-safe queue of FairQueueLanes; put() takes (item, priority, submitter)"""
+    
+    def __init__(self, name="conversion", maxsize=0):
+        self.name = name
+        super().__init__(maxsize)
+    
+    def _init(self, maxsize):
+        self.queue = FairQueueLanes(self.name)
+    
+    def snapshot(self):
+        """Queued items in the order they would be taken"""
+        with self.mutex:
+            return list(self.queue)
+    
+    def reprioritize(self, match, priority):
+        """Move queued items for which match(item) is true to another priority"""
+        with self.mutex:
+            return self.queue.reprioritize(match, priority)
+    
+    def clear(self):
+        """Drop all queued items, e.g. on abort, without counting them in the wait statistics"""
+        with self.mutex:
+            dropped = self.queue.clear()
+            self.unfinished_tasks -= dropped
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+            return dropped
+
 # Global variables
 selected_pdf_paths = []
+selected_page_counts = {}  # Page count of each selected PDF, learned during validation
+file_priorities = {}  # Priority of each selected PDF other than "normal", set from the file list
+PRIORITY_COLORS = {"urgent": "#ffe0e0", "normal": "white", "bulk": "#eeeeee"}  # File list backgrounds
 PRESERVE_AMENDMENTS = True
 FORMAT_DATES = True
-conversion_queue = queue.Queue()
+conversion_queue = FairPriorityQueue("conversion")  # (pdf_path, output_dir, output_format, compression, rule_pack) items
+service_job_queue = None  # asyncio queue of the conversion service, when running
+SAVE_QUEUE_SIZE = 2  # Rendered documents allowed to wait for the writer thread
 abort_processing = False
 processing_thread = None
+config = {}
+root = None  # Main window, created by build_gui()
+# Output format choices in the GUI -> OUTPUT_FORMATS key
+OUTPUT_FORMAT_CHOICES = {"DOCX": "docx", "Markdown": "markdown", "HTML": "html", "JSON": "json"}
 backup_dir = "backup_documents"
+timing_history_path = "pdf_converter_timings.json"
+DEFAULT_SECONDS_PER_PAGE = 0.5  # Used until a conversion has been timed
+timing_history = None
+search_index_path = None  # SQLite FTS5 index fed by conversions, when enabled
+duplicate_groups = {}  # Representative PDF -> [(near-duplicate PDF, similarity)] of the current batch
+duplicate_signatures = {}  # PDF -> MinHash signature of the current batch, to regroup after a failure
+
+def set_file_priority(priority):
+    """Give the files selected in the list a priority, also if they are already queued"""
+    for index in file_listbox.curselection():
+        path = selected_pdf_paths[index]
+        file_priorities[path] = priority
+        file_listbox.itemconfig(index, {'bg': PRIORITY_COLORS[priority]})
+        if conversion_queue.reprioritize(lambda item, p=path: item[0] == p, priority):
+            logging.info(f"Queued file {os.path.basename(path)} is now {priority}")
+
+def show_priority_menu(event):
+    """Open the priority menu for the file under the pointer"""
+    index = file_listbox.nearest(event.y)
+    if index < 0:
+        return
+    if index not in file_listbox.curselection():
+        file_listbox.selection_clear(0, tk.END)
+        file_listbox.selection_set(index)
+    priority_menu.tk_popup(event.x_root, event.y_root)
 
 def update_file_status(pdf_path, color):
     """Update a file's status color in the listbox"""
@@ -46,20 +220,26 @@ def update_file_status(pdf_path, color):
 
 # Set up robust logging
 log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-os.makedirs(backup_dir, exist_ok=True)
-
-log_file = os.path.join(log_dir, f"pdf_conversion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-# Add console handler for critical errors
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.ERROR)
-logging.getLogger().addHandler(console_handler)
+log_file = None
+
+def setup_logging(path=None):
+    """Configure logging to a timestamped log file (or the given one) and the console"""
+    global log_file
+    if log_file is not None:
+        return log_file
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = path or os.path.join(log_dir, f"pdf_conversion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    
+    # Add console handler for critical errors
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(logging.ERROR)
+    logging.getLogger().addHandler(console_handler)
+    return log_file
 
 def log_error(message, exception=None):
     """Log error with full stack trace and console output"""
@@ -77,6 +257,7 @@ def create_document_backup(file_path):
         return None
         
     try:
+        os.makedirs(backup_dir, exist_ok=True)
         backup_file = os.path.join(backup_dir, os.path.basename(file_path))
         shutil.copy2(file_path, backup_file)
         logging.info(f"Created backup of {file_path} at {backup_file}")
@@ -95,8 +276,18 @@ def calculate_file_hash(file_path):
         log_error(f"Failed to calculate hash for {file_path}", e)
         return None
 
+MIN_TEXT_LAYER_CHARS = 10  # Arbitrary minimum text length of a page with a usable text layer
+
+def has_text_layer(text):
+    """Whether extracted page text is usable, rather than empty or a stray page number or stamp
+
+    Pages without a usable text layer fail validation, or are OCRed when OCR is enabled.
+    """
+    return len((text or "").strip()) >= MIN_TEXT_LAYER_CHARS
+
 def validate_pdf(pdf_path):
     """Validate that PDF file is readable and contains text"""
+    import pdfplumber
     try:
         logging.info(f"Validating PDF: {pdf_path}")
         with pdfplumber.open(pdf_path) as pdf:
@@ -109,7 +300,11 @@ def validate_pdf(pdf_path):
             for page_idx in pages_to_check:
                 page = pdf.pages[page_idx]
                 text = page.extract_text()
-                if not text or len(text.strip()) < 10:  # Arbitrary minimum text length
+                if not has_text_layer(text):
+                    if ocr_enabled():
+                        # Scanned page: its text comes from OCR during conversion
+                        logging.info(f"PDF page {page_idx+1} has no text layer, will use OCR: {pdf_path}")
+                        continue
                     log_error(f"PDF page {page_idx+1} has insufficient text content: {pdf_path}")
                     return False, f"Page {page_idx+1} has insufficient text content"
                     
@@ -118,46 +313,490 @@ def validate_pdf(pdf_path):
         log_error(f"PDF validation failed for {pdf_path}", e)
         return False, f"PDF validation error: {str(e)}"
 
-def classify_line(line):
-    """Classify line based on content patterns for styling"""
-    line = line.strip()
-    # Check for Notes: pattern first
-    if re.match(r'^Notes\s*:', line, re.I):
-        return "Normal"  # Treat Notes: as normal text
-    # Check for special section formats with symbols - EXPANDED PATTERN
-    elif re.match(r'^[♦◉]\s*\d+[A-Za-z]?\.', line):
-        return "Heading 3"
-    # Special case for list items with symbols (not section headers)
-    elif re.match(r'^[♦◉]\s*\(\d+\)', line):
-        return "Normal"  # Treat as normal text or list item
-    elif re.match(r'^Schedule\b.*', line, re.I):
-        return "Heading 5"
-    elif re.match(r'^NEPAL.*ACT.*\d{4}', line, re.I):
-        return "Title"
-    elif re.match(r'^Date of (Authentication|Publication|Authentication and Publication|Royal Seal and Publication)\b.*', line, re.I):
-        return "Subtitle"
-    elif re.match(r'^AN ACT MADE TO.*', line, re.I):
-        return "Subtitle"
-    elif re.match(r'^Amendments\s*:?', line, re.I):
-        return "Subtitle"
-    elif re.match(r'^Preamble\s*:?', line, re.I):
-        return "Heading 1"
-    elif re.match(r'^Chapter\s*[-–]?\s*\d+', line, re.I):
-        return "Heading 2"
-    # New section formats
-    elif re.match(r'^[♦◉]\s*\(\d+\)D?', line):
-        return "Heading 3"
-    elif re.match(r'^\d+[A-Za-z]?\.\s+', line):
-        return "Heading 3"
-    elif re.match(r'^\(\d+\)', line):
-        return "Heading 4"
-    elif re.match(r'^\d{4}\.\d{1,2}\.\d{1,2}.*', line):
-         return "Normal"
+# ---------------------------------------------------------------------------
+# Metrics: in-process registry exported in Prometheus text format
+# ---------------------------------------------------------------------------
+
+METRIC_DEFINITIONS = {
+    "pdf_converter_files_processed_total": ("counter", "Files finished, by outcome"),
+    "pdf_converter_pages_processed_total": ("counter", "Pages extracted and classified"),
+    "pdf_converter_failures_total": ("counter", "Failed or unverified files, by reason"),
+    "pdf_converter_stage_seconds": ("histogram", "Time spent per file in each conversion stage"),
+    "pdf_converter_pages_per_second": ("gauge", "Pages processed per second over the last minute"),
+    "pdf_converter_queue_depth": ("gauge", "Files waiting to be converted"),
+    "pdf_converter_queue_wait_seconds": ("histogram", "Time files waited in a queue, by priority"),
+    "pdf_converter_resident_memory_bytes": ("gauge", "Resident memory of the converting process"),
+    "pdf_converter_worker_peak_memory_bytes": ("gauge", "Peak resident memory of each service worker process, "
+                                                        "as of its last finished job"),
+}
+METRIC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 3600, float("inf"))
+PAGE_RATE_WINDOW = 60  # Seconds of page completions used for pages/sec
+
+metrics_lock = threading.Lock()
+metrics_values = {}  # (name, labels) -> counter value, or [bucket counts, sum, count] for histograms
+metrics_page_times = collections.deque(maxlen=100000)
+metrics_started = time.time()
+metrics_server = None
+
+def metrics_inc(name, value=1, **labels):
+    """Increment a counter in the metrics registry"""
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        metrics_values[key] = metrics_values.get(key, 0) + value
+
+def metrics_observe(name, value, **labels):
+    """Record an observation in a histogram of the metrics registry"""
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        histogram = metrics_values.setdefault(key, [[0] * len(METRIC_BUCKETS), 0.0, 0])
+        for i, bound in enumerate(METRIC_BUCKETS):
+            if value <= bound:
+                histogram[0][i] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+def metrics_set(name, value, **labels):
+    """Set a gauge in the metrics registry"""
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        metrics_values[key] = value
+
+def record_pages_processed(count=1):
+    """Count processed pages and remember when they finished for the page rate"""
+    metrics_inc("pdf_converter_pages_processed_total", count)
+    now = time.time()
+    with metrics_lock:
+        metrics_page_times.extend([now] * count)
+
+def classify_failure_reason(status_msg):
+    """Map a conversion status message to a failure reason label"""
+    message = (status_msg or "").lower()
+    if "aborted" in message:
+        return "aborted"
+    if "validation" in message or "insufficient text" in message or "no pages" in message:
+        return "validation"
+    if "failed to save" in message:
+        return "save"
+    if "output document verification" in message:
+        return "output_check"
+    return "conversion_error"
+
+def record_conversion_metrics(output_path, status_msg, doc_stats, is_valid):
+    """Record the outcome and stage timings of a finished file"""
+    if not output_path:
+        metrics_inc("pdf_converter_files_processed_total", status="error")
+        metrics_inc("pdf_converter_failures_total", reason=classify_failure_reason(status_msg))
+    elif is_valid:
+        metrics_inc("pdf_converter_files_processed_total", status="success")
     else:
-        return "Normal"
+        metrics_inc("pdf_converter_files_processed_total", status="warning")
+        metrics_inc("pdf_converter_failures_total", reason="verification")
+    for stage, seconds in doc_stats.get("timings", {}).items():
+        metrics_observe("pdf_converter_stage_seconds", seconds, stage=stage)
+
+def get_process_memory():
+    """Resident memory of this process in bytes, or None when unavailable"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def get_process_peak_memory():
+    """Peak resident memory of this process in bytes, or its current memory when the peak is unavailable"""
+    try:
+        import psutil
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)  # Windows only
+        if peak is not None:
+            return peak
+    except ImportError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Bytes on macOS, KiB elsewhere
+    except ImportError:
+        return get_process_memory()
+
+def collect_live_metrics():
+    """Sample the gauges that are computed when metrics are read"""
+    now = time.time()
+    with metrics_lock:
+        while metrics_page_times and metrics_page_times[0] < now - PAGE_RATE_WINDOW:
+            metrics_page_times.popleft()
+        recent_pages = len(metrics_page_times)
+    window = min(PAGE_RATE_WINDOW, max(now - metrics_started, 1))
+    gauges = [
+        ("pdf_converter_pages_per_second", (), recent_pages / window),
+        ("pdf_converter_queue_depth", (("queue", "conversion"),), conversion_queue.qsize()),
+    ]
+    if service_job_queue is not None:
+        gauges.append(("pdf_converter_queue_depth", (("queue", "service"),), service_job_queue.qsize()))
+    memory = get_process_memory()
+    if memory is not None:
+        gauges.append(("pdf_converter_resident_memory_bytes", (), memory))
+    return gauges
+
+def get_metrics_snapshot():
+    """Current metric values as a dictionary, for in-process consumers"""
+    snapshot = {}
+    with metrics_lock:
+        values = dict(metrics_values)
+    for (name, labels), value in values.items():
+        label_key = ",".join(f"{k}={v}" for k, v in labels)
+        if isinstance(value, list):
+            value = {"count": value[2], "sum": value[1]}
+        snapshot.setdefault(name, {})[label_key] = value
+    for name, labels, value in collect_live_metrics():
+        snapshot.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+    return snapshot
+
+def format_metric_labels(labels, extra=()):
+    """Format a label set in Prometheus exposition syntax"""
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    with metrics_lock:
+        values = {key: (list(value[0]), value[1], value[2]) if isinstance(value, list) else value
+                  for key, value in metrics_values.items()}
+    samples = {}
+    for (name, labels), value in values.items():
+        samples.setdefault(name, []).append((labels, value))
+    for name, labels, value in collect_live_metrics():
+        samples.setdefault(name, []).append((labels, value))
+    
+    lines = []
+    for name, (metric_type, help_text) in METRIC_DEFINITIONS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(samples.get(name, [])):
+            if metric_type == "histogram":
+                bucket_counts, total, count = value
+                for bound, bucket_count in zip(METRIC_BUCKETS, bucket_counts):
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{format_metric_labels(labels, [('le', le)])} {bucket_count}")
+                lines.append(f"{name}_sum{format_metric_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_metric_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{format_metric_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve metrics on a local port from a background thread"""
+    global metrics_server
+    if metrics_server is not None or not port:
+        return metrics_server
+    import http.server
+    
+    class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+        """Serve the metrics registry on /metrics"""
+    
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    
+        def log_message(self, format, *args):
+            logging.debug(f"Metrics request: {format % args}")
+    
+    try:
+        metrics_server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    except OSError as e:
+        log_error(f"Failed to start metrics server on port {port}", e)
+        return None
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+    return metrics_server
+
+# ---------------------------------------------------------------------------
+# Rule packs: declarative heading rules, compiled into one matcher per pack
+# ---------------------------------------------------------------------------
+#
+# A rule pack is a JSON (or, with PyYAML, YAML) file in rule_pack_dir:
+#
+#   {"name": "...", "description": "...",
+#    "detect": [{"pattern": "...", "ignore_case": true}, ...],
+#    "rules": [{"pattern": "...", "tag": "Heading 3", "ignore_case": false}, ...],
+#    "default_tag": "Normal",
+#    "chapter_pattern": {"pattern": "...(number)...(title)", "ignore_case": true},
+#    "section_pattern": {"pattern": "...(number)...(title)"},
+#    "symbol_section_pattern": {"pattern": "...(symbol)...(number)...(title)"},
+#    "symbol_list_pattern": {"pattern": "...(symbol)...(number)...(text)"},
+#    "date_heading_pattern": {"pattern": "..."}, "date_line_pattern": {"pattern": "..."},
+#    "amendments_pattern": {"pattern": "..."}}
+#
+# Rules are tried in order against each stripped line and the first match
+# gives the tag. "detect" patterns are searched in the first page with text
+# to pick a pack automatically. Rules and detect patterns are merged into one
+# alternation, so they cannot use numbered backreferences; use (?P<name>...)
+# and (?P=name) instead.
+#
+# The layout patterns are optional and drive the state machine:
+# - chapter/section capture the number and title of "Chapter N: ..." and
+#   "Section N: ..." headings; symbol_section does the same for Heading 3
+#   lines marked with a symbol, and symbol_list for Heading 3 lines that are
+#   really symbol-marked list items, rendered as Normal text.
+# - A date_line right after a date_heading subtitle is merged into it.
+# - An amendments subtitle starts a list rendered as Subtitle lines, up to
+#   the next title, Heading 1/2 or other subtitle.
+
+RULE_TAGS = ("Title", "Subtitle", "Heading 1", "Heading 2", "Heading 3", "Heading 4", "Heading 5", "Normal")
+RULE_PACK_FORMAT = 2  # Version of the compiled form stored in rule_cache_dir
+RULE_PACK_EXTENSIONS = (".json", ".yaml", ".yml")
+
+BUILTIN_RULE_PACK = {
+    "name": "nepal",
+    "description": "Acts of Nepal as published by the Nepal Law Commission",
+    "detect": [{"pattern": r"^NEPAL.*ACT.*\d{4}", "ignore_case": True}],
+    "rules": [
+        {"pattern": r"^Notes\s*:", "tag": "Normal", "ignore_case": True},
+        {"pattern": r"^[♦◉]\s*\d+[A-Za-z]?\.", "tag": "Heading 3"},  # Sections marked with symbols
+        {"pattern": r"^[♦◉]\s*\(\d+\)", "tag": "Normal"},  # List items with symbols
+        {"pattern": r"^Schedule\b", "tag": "Heading 5", "ignore_case": True},
+        {"pattern": r"^NEPAL.*ACT.*\d{4}", "tag": "Title", "ignore_case": True},
+        {"pattern": r"^Date of (Authentication|Publication|Authentication and Publication|Royal Seal and Publication)\b",
+         "tag": "Subtitle", "ignore_case": True},
+        {"pattern": r"^AN ACT MADE TO", "tag": "Subtitle", "ignore_case": True},
+        {"pattern": r"^Amendments\s*:?", "tag": "Subtitle", "ignore_case": True},
+        {"pattern": r"^Preamble\s*:?", "tag": "Heading 1", "ignore_case": True},
+        {"pattern": r"^Chapter\s*[-–]?\s*\d+", "tag": "Heading 2", "ignore_case": True},
+        {"pattern": r"^\d+[A-Za-z]?\.\s+", "tag": "Heading 3"},
+        {"pattern": r"^\(\d+\)", "tag": "Heading 4"},
+    ],
+    "default_tag": "Normal",
+    "chapter_pattern": {"pattern": r"^Chapter\s*[-–]?\s*(\d+)\s*(.*)", "ignore_case": True},
+    "section_pattern": {"pattern": r"^(\d+[A-Za-z]?)\.\s*(.*)"},
+    "symbol_section_pattern": {"pattern": r"^([♦◉])\s*(\d+[A-Za-z]?)\.?\s*(.*)"},
+    "symbol_list_pattern": {"pattern": r"^([♦◉])\s*\((\d+)\)\s*(.*)"},
+    "date_heading_pattern": {
+        "pattern": r"^Date of (Authentication|Publication|Authentication and Publication|Royal Seal and Publication)",
+        "ignore_case": True},
+    "date_line_pattern": {"pattern": r"^\d{4}\.\d{1,2}\.\d{1,2}"},  # Bikram Sambat dates, e.g. 2049.7.24
+    "amendments_pattern": {"pattern": r"^Amendments\s*:?", "ignore_case": True},
+}
+# Compiled key, rule pack field and what the pattern must capture, in order
+LAYOUT_PATTERNS = (
+    ("chapter", "chapter_pattern", ("the number", "the title")),
+    ("section", "section_pattern", ("the number", "the title")),
+    ("symbol_section", "symbol_section_pattern", ("the symbol", "the number", "the title")),
+    ("symbol_list", "symbol_list_pattern", ("the symbol", "the number", "the text")),
+    ("date_heading", "date_heading_pattern", ()),
+    ("date_line", "date_line_pattern", ()),
+    ("amendments", "amendments_pattern", ())
+)
+
+builtin_rule_pack = None
+loaded_rule_packs = {}  # Rule pack path -> compiled rules, loaded once per process
+loaded_rule_packs_lock = threading.Lock()
+
+def rule_source(rule):
+    """Regex source of a rule, with its case flag scoped to it"""
+    return f"(?i:{rule['pattern']})" if rule.get("ignore_case") else f"(?:{rule['pattern']})"
+
+def check_rule_pattern(pack_name, what, rule, captures=(), merged=False):
+    """Raise ValueError unless rule has a valid pattern capturing a group for each of captures
+
+    Patterns merged into an alternation must not refer to groups by number,
+    as merging renumbers them.
+    """
+    if not isinstance(rule, dict) or not isinstance(rule.get("pattern"), str):
+        raise ValueError(f"Rule pack {pack_name}: {what} needs a 'pattern'")
+    try:
+        groups = re.compile(rule["pattern"]).groups
+    except re.error as e:
+        raise ValueError(f"Rule pack {pack_name}: {what} has an invalid pattern: {e}")
+    if groups < len(captures):
+        raise ValueError(f"Rule pack {pack_name}: {what} must capture {', '.join(captures[:-1])} and {captures[-1]}")
+    if merged and any(re.fullmatch(r'\\[1-9]|\(\?\(\d', token)
+                      for token in re.findall(r'\\.|\(\?\(\d', rule["pattern"])):
+        raise ValueError(f"Rule pack {pack_name}: {what} refers to a group by number; "
+                         f"use a named group and (?P=name) instead")
+
+def compile_rule_pack(pack):
+    """Validate a rule pack and merge its rules into matcher sources (JSON-serializable)"""
+    if not isinstance(pack, dict) or not isinstance(pack.get("name"), str) or not pack["name"]:
+        raise ValueError("A rule pack must be an object with a 'name'")
+    name = pack["name"]
+    rules = pack.get("rules")
+    if not isinstance(rules, list) or not rules:
+        raise ValueError(f"Rule pack {name}: 'rules' must be a non-empty list")
+    
+    # All rules become one alternation; the name of the matching group gives the tag
+    alternatives, tags = [], {}
+    for index, rule in enumerate(rules):
+        check_rule_pattern(name, f"rule {index + 1}", rule, merged=True)
+        if rule.get("tag") not in RULE_TAGS:
+            raise ValueError(f"Rule pack {name}: rule {index + 1} has unknown tag {rule.get('tag')!r} "
+                             f"(expected one of {', '.join(RULE_TAGS)})")
+        alternatives.append(f"(?P<rule{index}>{rule_source(rule)})")
+        tags[f"rule{index}"] = rule["tag"]
+    compiled = {
+        "format": RULE_PACK_FORMAT,
+        "name": name,
+        "matcher": "|".join(alternatives),
+        "tags": tags,
+        "default_tag": pack.get("default_tag", "Normal"),
+        "detect": None
+    }
+    if compiled["default_tag"] not in RULE_TAGS:
+        raise ValueError(f"Rule pack {name}: unknown default_tag {compiled['default_tag']!r}")
+    
+    detect = pack.get("detect", [])
+    for index, rule in enumerate(detect):
+        check_rule_pattern(name, f"detect pattern {index + 1}", rule, merged=True)
+    if detect:
+        compiled["detect"] = "|".join(rule_source(rule) for rule in detect)
+    for key, what, captures in LAYOUT_PATTERNS:
+        compiled[key] = None
+        if pack.get(what) is not None:
+            check_rule_pattern(name, what, pack[what], captures)
+            compiled[key] = rule_source(pack[what])
+    
+    try:
+        re.compile(compiled["matcher"])
+    except re.error as e:
+        raise ValueError(f"Rule pack {name}: rules cannot be combined: {e}")
+    return compiled
+
+def activate_rule_pack(compiled):
+    """Turn the matcher sources of a compiled rule pack into regular expressions"""
+    rules = {
+        "name": compiled["name"],
+        "matcher": re.compile(compiled["matcher"]),
+        "tags": compiled["tags"],
+        "default_tag": compiled["default_tag"],
+        "detect": re.compile(compiled["detect"], re.M) if compiled["detect"] else None
+    }
+    for key, _, _ in LAYOUT_PATTERNS:
+        rules[key] = re.compile(compiled[key]) if compiled[key] else None
+    return rules
+
+def get_builtin_rule_pack():
+    """Compiled rules of BUILTIN_RULE_PACK"""
+    global builtin_rule_pack
+    if builtin_rule_pack is None:
+        builtin_rule_pack = activate_rule_pack(compile_rule_pack(BUILTIN_RULE_PACK))
+    return builtin_rule_pack
+
+def parse_rule_pack(raw, path):
+    """Parse the JSON or YAML text of a rule pack file"""
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"PyYAML is needed to read the YAML rule pack {path}")
+        return yaml.safe_load(raw)
+    return json.loads(raw.decode('utf-8'))
+
+def load_rule_pack(path):
+    """Load, validate and compile a rule pack file once per process
+
+    The compiled form is cached in rule_cache_dir under the SHA-256 of the
+    file, so unchanged packs skip parsing and validation on later runs.
+    """
+    with loaded_rule_packs_lock:
+        if path in loaded_rule_packs:
+            return loaded_rule_packs[path]
+    
+    with open(path, 'rb') as f:
+        raw = f.read()
+    cache_dir = config.get("rule_cache_dir", "rule_cache")
+    cache_path = os.path.join(cache_dir, f"{hashlib.sha256(raw).hexdigest()}.json")
+    compiled = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                compiled = json.load(f)
+        except (OSError, ValueError) as e:
+            log_error(f"Ignoring unreadable rule pack cache {cache_path}", e)
+    if not compiled or compiled.get("format") != RULE_PACK_FORMAT:
+        compiled = compile_rule_pack(parse_rule_pack(raw, path))
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(compiled, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, cache_path)
+    
+    rules = activate_rule_pack(compiled)
+    with loaded_rule_packs_lock:
+        loaded_rule_packs[path] = rules
+    logging.info(f"Loaded rule pack {rules['name']} from {path}")
+    return rules
+
+def find_rule_packs():
+    """Paths of the rule pack files in rule_pack_dir, by name"""
+    pack_dir = config.get("rule_pack_dir", "rule_packs")
+    if not os.path.isdir(pack_dir):
+        return []
+    return [os.path.join(pack_dir, name) for name in sorted(os.listdir(pack_dir))
+            if name.lower().endswith(RULE_PACK_EXTENSIONS)]
+
+def resolve_rule_pack_path(setting):
+    """Find the file of a rule pack given by path or by name in rule_pack_dir"""
+    if os.path.exists(setting):
+        return setting
+    for path in find_rule_packs():
+        if os.path.splitext(os.path.basename(path))[0] == setting:
+            return path
+    raise ValueError(f"Rule pack not found: {setting}")
+
+def list_rule_pack_choices():
+    """Rule pack settings offered to users: "builtin", "auto" and the pack names in rule_pack_dir"""
+    return ["builtin", "auto"] + [os.path.splitext(os.path.basename(path))[0] for path in find_rule_packs()]
+
+def select_rule_pack(first_page_text="", setting=None):
+    """Rules for a document: setting (by default the configured rule_pack), "builtin",
+    or "auto" to detect a pack of rule_pack_dir from the first page"""
+    setting = setting or config.get("rule_pack", "builtin") or "builtin"
+    if setting == "builtin":
+        return get_builtin_rule_pack()
+    if setting != "auto":
+        return load_rule_pack(resolve_rule_pack_path(setting))
+    
+    for path in find_rule_packs():
+        try:
+            rules = load_rule_pack(path)
+        except (OSError, ValueError) as e:
+            log_error(f"Skipping invalid rule pack {path}", e)
+            continue
+        if rules["detect"] and rules["detect"].search(first_page_text):
+            return rules
+    return get_builtin_rule_pack()
+
+def classify_with_rules(line, rules):
+    """Tag of a line under a compiled rule pack"""
+    match = rules["matcher"].match(line.strip())
+    return rules["tags"][match.lastgroup] if match else rules["default_tag"]
+
+def match_layout(rules, key, text):
+    """Match text against a layout pattern of a rule pack; None if the pack has none"""
+    return rules[key] and rules[key].match(text)
+
+def classify_line(line):
+    """Classify line based on content patterns for styling, using the built-in rules"""
+    return classify_with_rules(line, get_builtin_rule_pack())
 
 def add_styled_paragraph(doc, text, style_tag, is_under_h5=False):
     """Add a styled paragraph to the document"""
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from docx.shared import Inches, Pt
+    
     p = doc.add_paragraph()
     try:
         p.style = doc.styles[style_tag]
@@ -253,21 +892,416 @@ def extract_table_from_lines(lines, start_idx):
     
     return table_data, i - start_idx
 
-def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
+def get_output_path(pdf_path, output_dir=None, output_format="docx"):
+    """Determine the output path of the structured output for a PDF"""
+    suffix = OUTPUT_FORMATS[output_format]
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        output_filename = os.path.basename(os.path.splitext(pdf_path)[0]) + suffix
+        return os.path.join(output_dir, output_filename)
+    return os.path.splitext(pdf_path)[0] + suffix
+
+# ---------------------------------------------------------------------------
+# DOCX packaging: zip parts deflated at a chosen level, large parts in parallel
+# ---------------------------------------------------------------------------
+
+DOCX_COMPRESSION_LEVELS = {"store": None, "fast": 1, "default": 6, "max": 9}
+DOCX_COMPRESS_CHUNK = 1 << 20  # Parts are deflated in chunks of this size on the packaging pool
+DOCX_PARALLEL_MIN_BYTES = 256 * 1024  # Smaller documents are compressed on the calling thread
+DOCX_VERIFY_BUFFERS = 4  # Packaged documents kept in memory until they are verified
+
+packaging_pool = None
+packaging_pool_lock = threading.Lock()
+packaged_documents = collections.OrderedDict()  # Output path -> DOCX bytes awaiting verification
+packaged_documents_lock = threading.Lock()
+
+def get_packaging_pool():
+    """Create the compression thread pool on first use (zlib releases the GIL)"""
+    global packaging_pool
+    from concurrent.futures import ThreadPoolExecutor
+    with packaging_pool_lock:
+        if packaging_pool is None:
+            packaging_pool = ThreadPoolExecutor(max_workers=config.get("docx_compress_threads", 0) or os.cpu_count() or 1)
+        return packaging_pool
+
+def collect_docx_parts(doc):
+    """Serialize a python-docx document into (zip member name, bytes), in python-docx's order"""
+    from docx.opc.pkgwriter import PackageWriter
+    package = doc.part.package
+    parts = package.parts
+    for part in parts:
+        part.before_marshal()
+    members = []
+    # Stands in for python-docx's zip writer, which only ever calls write()
+    collector = types.SimpleNamespace(write=lambda pack_uri, blob: members.append((pack_uri.membername, blob)))
+    PackageWriter._write_content_types_stream(collector, parts)
+    PackageWriter._write_pkg_rels(collector, package.rels)
+    PackageWriter._write_parts(collector, parts)
+    return members
+
+def deflate_chunk(data, start, end, level):
+    """Raw-deflate data[start:end] so that consecutive chunks join into one stream
+
+    Each chunk is primed with the 32 KiB before it, as pigz does, so
+    splitting costs almost nothing in compression ratio.
+    """
+    view = memoryview(data)
+    window = view[max(start - 32768, 0):start]
+    if len(window):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=window)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(view[start:end])
+    return compressed + compressor.flush(zlib.Z_FINISH if end >= len(data) else zlib.Z_SYNC_FLUSH)
+
+def write_zip(f, entries):
+    """Write a zip archive of (name, crc, size, method, stored bytes) entries"""
+    now = time.localtime()
+    dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+    dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+    central_directory = []
+    offset = 0
+    for name, crc, size, method, data in entries:
+        name = name.encode('utf-8')
+        header = struct.pack("<IHHHHHIIIHH", 0x04034b50, 20, 0x800, method, dos_time, dos_date,
+                             crc, len(data), size, len(name), 0)
+        f.write(header + name)
+        f.write(data)
+        central_directory.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, 20, 20, 0x800, method,
+                                             dos_time, dos_date, crc, len(data), size, len(name),
+                                             0, 0, 0, 0, 0o600 << 16, offset) + name)
+        offset += len(header) + len(name) + len(data)
+    directory = b"".join(central_directory)
+    f.write(directory)
+    f.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, len(central_directory), len(central_directory),
+                        len(directory), offset, 0))
+
+def package_docx(doc, compression="default"):
+    """Package a document into DOCX bytes at a compression level of DOCX_COMPRESSION_LEVELS
+
+    Returns the bytes and packaging statistics (level, sizes, seconds).
+    """
+    started = time.time()
+    level = DOCX_COMPRESSION_LEVELS[compression]
+    buffer = io.BytesIO()
+    try:
+        members = collect_docx_parts(doc)
+    except (ImportError, AttributeError) as e:
+        # python-docx internals changed; its own writer still works, at the default level
+        logging.warning(f"Falling back to python-docx packaging: {e}")
+        doc.save(buffer)
+        data = buffer.getvalue()
+        return data, {"compression": "default", "bytes": len(data), "uncompressed_bytes": None,
+                      "parallel": False, "seconds": time.time() - started}
+    
+    uncompressed_bytes = sum(len(blob) for _, blob in members)
+    parallel = level is not None and uncompressed_bytes >= DOCX_PARALLEL_MIN_BYTES
+    chunk_results = []
+    for _, blob in members:
+        if level is None:
+            chunk_results.append([blob])
+            continue
+        bounds = [(start, min(start + DOCX_COMPRESS_CHUNK, len(blob)))
+                  for start in range(0, max(len(blob), 1), DOCX_COMPRESS_CHUNK)]
+        if parallel:
+            chunk_results.append([get_packaging_pool().submit(deflate_chunk, blob, start, end, level)
+                                  for start, end in bounds])
+        else:
+            chunk_results.append([deflate_chunk(blob, start, end, level) for start, end in bounds])
+    
+    entries = []
+    for (name, blob), chunks in zip(members, chunk_results):
+        stored = b"".join(chunk.result() if parallel else chunk for chunk in chunks)
+        entries.append((name, zlib.crc32(blob), len(blob), 0 if level is None else 8, stored))
+    write_zip(buffer, entries)
+    data = buffer.getvalue()
+    return data, {"compression": compression, "bytes": len(data), "uncompressed_bytes": uncompressed_bytes,
+                  "parallel": parallel, "seconds": time.time() - started}
+
+def remember_packaged_document(output_path, data):
+    """Keep a saved document's bytes so verification need not read the file back"""
+    with packaged_documents_lock:
+        packaged_documents[output_path] = data
+        while len(packaged_documents) > DOCX_VERIFY_BUFFERS:
+            packaged_documents.popitem(last=False)
+
+def take_packaged_document(output_path):
+    """Return (and forget) the bytes saved to output_path by this process, if still held"""
+    with packaged_documents_lock:
+        return packaged_documents.pop(output_path, None)
+
+def save_document_atomic(doc, output_path, compression=None):
+    """Save document to a temporary file next to the output and rename it into place
+
+    Returns the DOCX bytes written and their packaging statistics.
+    """
+    data, packaging = package_docx(doc, compression or config.get("docx_compression", "default"))
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, output_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return data, packaging
+
+def save_converted_document(doc, pdf_path, output_path, document_stats, compression=None):
+    """Save a rendered document and check the written file
+
+    compression is a level of DOCX_COMPRESSION_LEVELS, or None for docx_compression.
+    """
+    # Save document with error handling
+    try:
+        save_started = time.time()
+        data, document_stats["docx_package"] = save_document_atomic(doc, output_path, compression)
+        document_stats["timings"]["save"] = time.time() - save_started
+        if config.get("docx_verify_from_memory", True):
+            remember_packaged_document(output_path, data)
+    except Exception as e:
+        log_error(f"Failed to save document {output_path}", e)
+        return None, f"Failed to save document: {str(e)}", document_stats
+        
+    # Verify output document
+    if not os.path.exists(output_path) or os.path.getsize(output_path) < 1000:  # Arbitrary minimum size
+        log_error(f"Output document verification failed for {output_path}: File too small or missing")
+        return None, "Output document verification failed", document_stats
+        
+    # Log success
+    logging.info(f"Successfully converted: {pdf_path} to {output_path}")
+    logging.info(f"Document statistics: {json.dumps(document_stats)}")
+    
+    return output_path, "Success", document_stats
+
+def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None, reflow=True, compression=None,
+                        rule_pack=None):
     """Convert PDF to structured DOCX with progress updates and validation"""
-    doc = Document()
-    url_pattern = re.compile(r'(?:https?://|www\.)\S+')
-    translation_pattern = re.compile(r'\s*\((Official|Unofficial)\s+Translation\)\s*', re.I)
-    is_within_heading_5 = False
-    last_p = None
-    last_tag = None
-    is_first_line_of_document = True
-    is_within_amendments = False
-    is_within_subsection = False  # Track if we're inside a subsection like (a), (b), etc.
-    is_processing_table = False
-    table_buffer = []
-    all_tables = []
-    document_stats = {
+    doc, status_msg, document_stats = build_document(pdf_path, progress_callback, reflow, rule_pack)
+    if doc is None:
+        return None, status_msg, document_stats
+
+    output_path = get_output_path(pdf_path, output_dir)
+
+    # Final progress update
+    if progress_callback:
+        total_pages = document_stats["total_pages"]
+        progress_callback(total_pages, total_pages, "Saving document...")
+
+    return save_converted_document(doc, pdf_path, output_path, document_stats, compression)
+
+# ---------------------------------------------------------------------------
+# OCR fallback: Tesseract on pages without a text layer, cached by content
+# ---------------------------------------------------------------------------
+
+ocr_pool = None
+ocr_pool_lock = threading.Lock()
+ocr_status = None  # None until checked, then whether Tesseract can be used
+
+def ocr_available():
+    """Check once whether pytesseract and the Tesseract binary are installed"""
+    global ocr_status
+    if ocr_status is None:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            ocr_status = True
+        except Exception as e:
+            logging.warning(f"OCR fallback unavailable, scanned pages will be skipped: {e}")
+            ocr_status = False
+    return ocr_status
+
+def ocr_enabled():
+    """Whether pages without text should be OCRed"""
+    return config.get("ocr_enabled", True) and ocr_available()
+
+def get_ocr_workers():
+    """Number of OCR worker processes"""
+    return config.get("ocr_workers", 0) or os.cpu_count() or 1
+
+def get_ocr_pool():
+    """Create the OCR process pool on first use"""
+    global ocr_pool
+    from concurrent.futures import ProcessPoolExecutor
+    with ocr_pool_lock:
+        if ocr_pool is None:
+            ocr_pool = ProcessPoolExecutor(max_workers=get_ocr_workers())
+        return ocr_pool
+
+def page_content_hash(page):
+    """Hash a page's content streams and images, which fully determine its rendering"""
+    from pdfminer.pdftypes import resolve1
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{page.width}x{page.height}".encode())
+    contents = resolve1(page.page_obj.attrs.get("Contents"))
+    for stream in contents if isinstance(contents, list) else [contents]:
+        stream = resolve1(stream)
+        if hasattr(stream, "get_data"):
+            digest.update(stream.get_data())
+    for image in page.images:
+        digest.update(image["stream"].get_rawdata() or b"")
+    return digest.hexdigest()
+
+def ocr_page(pdf_path, page_index, dpi, language, cache_path):
+    """Render one page, OCR it with Tesseract and cache the text (runs in the OCR pool)"""
+    import pdfplumber
+    import pytesseract
+    with pdfplumber.open(pdf_path) as pdf:
+        image = pdf.pages[page_index].to_image(resolution=dpi).original
+    text = pytesseract.image_to_string(image, lang=language)
+    
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, cache_path)
+    return text
+
+def start_page_ocr(page, pdf_path, page_index, document_stats):
+    """Return a future for a page's OCR text, served from the cache when possible"""
+    from concurrent.futures import Future
+    dpi = config.get("ocr_dpi", 300)
+    language = config.get("ocr_language", "eng")
+    cache_path = os.path.join(config.get("ocr_cache_dir", "ocr_cache"),
+                              f"{page_content_hash(page)}-{dpi}-{language}.txt")
+    document_stats["pages_ocr"] += 1
+    if os.path.exists(cache_path):
+        document_stats["ocr_cache_hits"] += 1
+        future = Future()
+        with open(cache_path, encoding='utf-8') as f:
+            future.set_result(f.read())
+        return future
+    
+    try:
+        return get_ocr_pool().submit(ocr_page, pdf_path, page_index, dpi, language, cache_path)
+    except Exception as e:
+        # No worker processes available here (e.g. a broken pool); OCR in this process
+        logging.warning(f"OCR pool unavailable, running OCR inline: {e}")
+        future = Future()
+        future.set_result(ocr_page(pdf_path, page_index, dpi, language, cache_path))
+        return future
+
+def iter_page_texts(pdf, pdf_path=None, document_stats=None):
+    """Yield (page number, text) for each page of an open PDF, in order
+
+    Pages without a usable text layer (see has_text_layer) are OCRed in the
+    OCR pool while the following pages are extracted; at most two pages per
+    OCR worker are held back waiting for their turn. The text is None for
+    pages with no text at all.
+    """
+    if document_stats is None:
+        document_stats = new_document_stats()
+    pdf_path = pdf_path or getattr(pdf, "path", None)
+    use_ocr = bool(pdf_path) and ocr_enabled()
+    window = get_ocr_workers() * 2 if use_ocr else 1
+    pending = collections.deque()  # (page number, extracted text, OCR future or None)
+    
+    def finish(page_num, text, ocr_future):
+        if ocr_future is not None:
+            ocr_started = time.time()
+            try:
+                text = ocr_future.result() or text
+            except Exception as e:
+                log_error(f"OCR failed for page {page_num} of {pdf_path}", e)
+            document_stats["timings"]["ocr"] += time.time() - ocr_started
+        return page_num, text
+    
+    try:
+        for page_num, page in enumerate(pdf.pages, 1):
+            extract_started = time.time()
+            text = page.extract_text()
+            ocr_future = None
+            if use_ocr and not has_text_layer(text):
+                ocr_future = start_page_ocr(page, pdf_path, page_num - 1, document_stats)
+            document_stats["timings"]["extract"] += time.time() - extract_started
+            # Release parsed page objects so memory stays bounded on long documents
+            if hasattr(page, "close"):
+                page.close()
+            else:
+                page.flush_cache()
+            
+            pending.append((page_num, text, ocr_future))
+            while pending and (pending[0][2] is None or pending[0][2].done() or len(pending) > window):
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        # Stopped early (e.g. aborted): drop OCR jobs nobody will read
+        for _, _, ocr_future in pending:
+            if ocr_future is not None:
+                ocr_future.cancel()
+
+# ---------------------------------------------------------------------------
+# Running headers and footers: lines repeated at the top or bottom of pages
+# ---------------------------------------------------------------------------
+
+RUNNING_LINE_DEPTH = 2  # Non-empty lines at each end of a page that may be a header or footer
+
+def normalize_running_line(line):
+    """Comparison key of a header/footer line; page numbers and spacing are ignored"""
+    return re.sub(r'\s+', ' ', re.sub(r'\d+', '#', line)).strip().lower()
+
+def page_edge_lines(lines):
+    """Yield ("top" or "bottom", line index) for the lines at the ends of a page"""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    for i in filled[:RUNNING_LINE_DEPTH]:
+        yield "top", i
+    for i in filled[-RUNNING_LINE_DEPTH:]:
+        yield "bottom", i
+
+def spool_page_texts(pages, total_pages, progress_callback=None):
+    """Extract all pages into a temporary file, indexing lines repeated at page ends
+
+    Returns the spool (rewound, one JSON [page number, text] per line) and
+    the set of (edge, normalized line) keys found on at least
+    running_line_min_pages pages and running_line_min_fraction of the pages
+    with text. Extraction is most of the work, so pages count as processed
+    here and this pass reports the first half of the progress.
+    """
+    spool = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+    counts = collections.Counter()
+    text_pages = 0
+    for page_num, text in pages:
+        if abort_processing:
+            break  # The pages read so far are classified, and the first block sees the abort
+        if progress_callback:
+            progress_callback(page_num, 2 * total_pages, f"Reading page {page_num}/{total_pages}")
+        spool.write(json.dumps([page_num, text]) + "\n")
+        if not text:
+            continue
+        text_pages += 1
+        record_pages_processed()
+        lines = text.split("\n")
+        counts.update({(edge, normalize_running_line(lines[i])) for edge, i in page_edge_lines(lines)})
+    spool.seek(0)
+    
+    min_pages = max(config.get("running_line_min_pages", 3),
+                    math.ceil(config.get("running_line_min_fraction", 0.5) * text_pages))
+    running_lines = {key for key, count in counts.items() if count >= min_pages and key[1] not in ("", "#")}
+    return spool, running_lines
+
+def read_spooled_pages(spool):
+    """Yield the (page number, text) pairs of a spool and close it"""
+    try:
+        for record in spool:
+            page_num, text = json.loads(record)
+            yield page_num, text
+    finally:
+        spool.close()
+
+def drop_running_lines(lines, running_lines, document_stats, keep_top=False):
+    """Remove a page's header and footer lines found in the running line index
+
+    With keep_top, only footers are removed (for the title page).
+    """
+    dropped = {i for edge, i in page_edge_lines(lines)
+               if not (keep_top and edge == "top") and (edge, normalize_running_line(lines[i])) in running_lines}
+    document_stats["running_lines_removed"] += len(dropped)
+    return [line for i, line in enumerate(lines) if i not in dropped]
+
+def new_document_stats():
+    """Create the statistics collected while a document is classified"""
+    return {
         "pages_processed": 0,
         "sections_found": 0,
         "tables_found": 0,
@@ -280,98 +1314,134 @@ def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
             "h3": 0,
             "h4": 0, 
             "h5": 0
+        },
+        "lines_reflowed": 0,
+        "paragraphs_rendered": 0,
+        "rule_pack": None,
+        "running_lines_removed": 0,
+        "pages_ocr": 0,
+        "ocr_cache_hits": 0,
+        "timings": {
+            "extract": 0.0,
+            "ocr": 0.0,
+            "render": 0.0
         }
     }
+
+def iter_document_blocks(pdf, document_stats=None, progress_callback=None, pdf_path=None,
+                         remove_running_lines=False, rule_pack=None):
+    """Yield classified blocks of an open pdfplumber PDF, page by page
+
+    Paragraph blocks are dicts with "type" "paragraph", the style "tag",
+    the rendered "text", the "page" they come from, the current "chapter"
+    and "section" numbers and "under_h5" for Normal text inside a Schedule.
+    Table blocks have "type" "table" and the table "rows" instead of tag and
+    text. A date line that follows a date heading subtitle of the rule pack
+    ("Date of ..." in the built-in pack) is merged into the subtitle's text
+    after a newline. Only the current page and the last paragraph are
+    held in memory, plus pages waiting for OCR.
     
-    # Create backup of the original document
-    create_document_backup(pdf_path)
+    With remove_running_lines, all pages are first extracted into a spool
+    file to index repeated headers and footers, which are then dropped
+    before classification; the first page with text keeps its header
+    lines. No block is yielded until every page has been extracted.
+    """
+    if document_stats is None:
+        document_stats = new_document_stats()
+    url_pattern = re.compile(r'(?:https?://|www\.)\S+')
+    translation_pattern = re.compile(r'\s*\((Official|Unofficial)\s+Translation\)\s*', re.I)
+    is_within_heading_5 = False
+    is_first_line_of_document = True
+    is_within_amendments = False
+    is_within_subsection = False  # Track if we're inside a subsection like (a), (b), etc.
+    is_processing_table = False
+    current_chapter = None
+    current_section = None
+    # Blocks from the last paragraph onwards; held back so a following date line can still be merged
+    held_blocks = []
+    rules = None  # Chosen from the first page with text
     
-    # Validate PDF before processing
-    is_valid, validation_message = validate_pdf(pdf_path)
-    if not is_valid:
-        return None, validation_message, document_stats
+    def paragraph(text, tag):
+        return {"type": "paragraph", "tag": tag, "text": text, "page": page_num,
+                "chapter": current_chapter, "section": current_section,
+                "under_h5": tag == "Normal" and is_within_heading_5}
     
-    try:
-        logging.info(f"Starting conversion of: {os.path.basename(pdf_path)}")
+    total_pages = len(pdf.pages)
+    pages = iter_page_texts(pdf, pdf_path, document_stats)
+    running_lines = set()
+    if remove_running_lines:
+        spool, running_lines = spool_page_texts(pages, total_pages, progress_callback)
+        pages = read_spooled_pages(spool)
+    for page_num, text in pages:
+        # Update progress; after a spool pass this is the second half
+        if progress_callback:
+            if remove_running_lines:
+                progress_callback(total_pages + page_num, 2 * total_pages, f"Processing page {page_num}/{total_pages}")
+            else:
+                progress_callback(page_num, total_pages, f"Processing page {page_num}/{total_pages}")
         
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            document_stats["total_pages"] = total_pages
-            logging.info(f"PDF has {total_pages} pages")
+        if not text:
+            logging.warning(f"No text found on page {page_num}")
+            continue
+        is_first_text_page = rules is None
+        if is_first_text_page:
+            rules = select_rule_pack(text, rule_pack)
+            document_stats["rule_pack"] = rules["name"]
+        
+        document_stats["pages_processed"] += 1
+        if not remove_running_lines:
+            record_pages_processed()
+        lines = text.split("\n")
+        # The first page with text keeps its top lines: a running header there is usually the title
+        if running_lines:
+            lines = drop_running_lines(lines, running_lines, document_stats, keep_top=is_first_text_page)
+        i = 0
+        while i < len(lines):
+            line = lines[i].strip()
+            original_line = line
+            new_blocks = []  # Blocks produced by this line, in document order
             
-            # Process each page for text
-            for page_num, page in enumerate(pdf.pages, 1):
-                if abort_processing:
-                    logging.warning(f"Processing aborted for {pdf_path}")
-                    return None, "Processing aborted by user", document_stats
+            # Remove translation markers
+            line = translation_pattern.sub('', line)
+            
+            if not line:
+                if is_within_heading_5 and not is_within_amendments:
+                    new_blocks.append(paragraph("", "Normal"))
+                i += 1
+            
+            elif re.fullmatch(r'\d+', line):
+                i += 1
+            
+            else:
+                # Check if this line is likely the start of a table
+                if is_likely_table_row(line) and not is_processing_table:
+                    is_processing_table = True
+                    table_data, rows_consumed = extract_table_from_lines(lines, i)
+                    is_processing_table = False
+                    if table_data and len(table_data) > 1:  # Ensure it's actually a table with multiple rows
+                        document_stats["tables_found"] += 1
+                        held_blocks.append({"type": "table", "rows": table_data, "page": page_num,
+                                            "chapter": current_chapter, "section": current_section})
+                        i += rows_consumed
+                        continue
+                    # Not a real table, process as normal text
                 
-                # Update progress
-                if progress_callback:
-                    progress_callback(page_num, total_pages, f"Processing page {page_num}/{total_pages}")
+                # Process as normal text if not a table
+                line_after_url_removal = url_pattern.sub('', line).strip()
+                line_after_url_removal = translation_pattern.sub('', line_after_url_removal)
+                i += 1
                 
-                text = page.extract_text()
-                if not text:
-                    logging.warning(f"No text found on page {page_num}")
+                if not line_after_url_removal:
                     continue
                 
-                document_stats["pages_processed"] += 1
-                lines = text.split("\n")
-                i = 0
-                while i < len(lines):
-                    line = lines[i].strip()
-                    original_line = line
-                    
-                    # Remove translation markers
-                    line = translation_pattern.sub('', line)
-                    
-                    if not line:
-                        if is_within_heading_5 and not is_within_amendments:
-                            current_p = add_styled_paragraph(doc, "", "Normal", is_under_h5=True)
-                            last_p = current_p
-                            last_tag = "Normal"
-                        i += 1
-                        continue
-                    
-                    if re.fullmatch(r'\d+', line):
-                        i += 1
-                        continue
-                    
-                    # Check if this line is likely the start of a table
-                    if is_likely_table_row(line) and not is_processing_table:
-                        is_processing_table = True
-                        table_data, rows_consumed = extract_table_from_lines(lines, i)
-                        if table_data and len(table_data) > 1:  # Ensure it's actually a table with multiple rows
-                            add_table_to_doc(doc, table_data)
-                            all_tables.append(table_data)  # Store table data for later reference
-                            document_stats["tables_found"] += 1
-                            i += rows_consumed
-                            is_processing_table = False
-                            continue
-                        else:
-                            # Not a real table, process as normal text
-                            is_processing_table = False
-                    
-                    # Process as normal text if not a table
-                    line_after_url_removal = url_pattern.sub('', line).strip()
-                    line_after_url_removal = translation_pattern.sub('', line_after_url_removal)
-                    
-                    if not line_after_url_removal:
-                        i += 1
-                        continue
-                    
-                    if is_first_line_of_document:
-                        tag = "Title"
-                        current_p = add_styled_paragraph(doc, line_after_url_removal, tag)
-                        document_stats["headings"]["title"] += 1
-                        last_p = current_p
-                        last_tag = tag
-                        is_first_line_of_document = False
-                        is_within_amendments = False
-                        is_within_heading_5 = False
-                        i += 1
-                        continue
-
-                    tag = classify_line(line_after_url_removal)
+                if is_first_line_of_document:
+                    document_stats["headings"]["title"] += 1
+                    new_blocks.append(paragraph(line_after_url_removal, "Title"))
+                    is_first_line_of_document = False
+                    is_within_amendments = False
+                    is_within_heading_5 = False
+                else:
+                    tag = classify_with_rules(line_after_url_removal, rules)
 
                     # Check if this is a subsection marker like (a), (b), etc.
                     is_letter_subsection = re.match(r'^\([a-z]\)', line_after_url_removal)
@@ -387,34 +1457,30 @@ def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
 
                     if is_within_amendments:
                         if tag in ["Title", "Heading 1", "Heading 2"] or \
-                           (tag == "Subtitle" and not re.match(r'^Amendments\s*:?', line_after_url_removal, re.I)):
+                           (tag == "Subtitle" and not match_layout(rules, "amendments", line_after_url_removal)):
                             is_within_amendments = False
                         else:
-                            current_p = add_styled_paragraph(doc, line_after_url_removal, "Subtitle")
                             document_stats["headings"]["subtitle"] += 1
-                            last_p = current_p
-                            last_tag = "Subtitle"
-                            i += 1
-                            continue
-
-                    is_date_line = re.match(r'^\d{4}\.\d{1,2}\.\d{1,2}', original_line)
-                    is_prev_date_subtitle = last_p is not None and last_tag == "Subtitle" and \
-                                            re.match(r'^Date of (Authentication|Publication|Authentication and Publication|Royal Seal and Publication)', last_p.text.split('\n')[0], re.I)
-                    if is_prev_date_subtitle and is_date_line:
-                        last_p.add_run(f"\n{original_line}")
-                        i += 1
-                        continue
-
-                    current_p = None
-
-                    if tag == "Subtitle" and re.match(r'^Amendments\s*:?', line_after_url_removal, re.I):
+                            new_blocks.append(paragraph(line_after_url_removal, "Subtitle"))
+                            tag = None
+
+                    last_paragraph = held_blocks[0] if held_blocks and held_blocks[0]["type"] == "paragraph" else None
+                    is_date_line = match_layout(rules, "date_line", original_line)
+                    is_prev_date_subtitle = last_paragraph is not None and last_paragraph["tag"] == "Subtitle" and \
+                                            match_layout(rules, "date_heading", last_paragraph["text"].split('\n')[0])
+                    if tag is None:
+                        pass
+                    elif is_prev_date_subtitle and is_date_line:
+                        last_paragraph["text"] += f"\n{original_line}"
+                    elif tag == "Subtitle" and match_layout(rules, "amendments", line_after_url_removal):
                         is_within_amendments = True
                         is_within_heading_5 = False
-                        current_p = add_styled_paragraph(doc, line_after_url_removal, tag)
+                        new_blocks.append(paragraph(line_after_url_removal, tag))
                         document_stats["headings"]["subtitle"] += 1
                     elif tag == "Heading 5":
                         is_within_heading_5 = True
-                        current_p = add_styled_paragraph(doc, line_after_url_removal, tag)
+                        current_section = None
+                        new_blocks.append(paragraph(line_after_url_removal, tag))
                         document_stats["headings"]["h5"] += 1
                     elif tag in ["Title", "Subtitle", "Heading 1", "Heading 2", "Heading 3", "Heading 4"]:
                         is_within_heading_5 = False
@@ -427,18 +1493,19 @@ def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
                             document_stats["sections_found"] += 1
                             document_stats["headings"]["h3"] += 1
                             # Check for standard section format (number followed by dot)
-                            sec_match = re.match(r'^(\d+[A-Za-z]?)\.\s*(.*)', line_after_url_removal)
-                            # Check for special section formats with symbols - UPDATED PATTERN
-                            symbol_sec_match = re.match(r'^([♦◉])\s*(\d+[A-Za-z]?)\.?\s*(.*)', line_after_url_removal)
-                            # New pattern for list items with symbols
-                            symbol_list_match = re.match(r'^([♦◉])\s*\((\d+)\)\s*(.*)', line_after_url_removal)
+                            sec_match = match_layout(rules, "section", line_after_url_removal)
+                            # Check for special section formats with symbols
+                            symbol_sec_match = match_layout(rules, "symbol_section", line_after_url_removal)
+                            # Check for list items with symbols
+                            symbol_list_match = match_layout(rules, "symbol_list", line_after_url_removal)
                             
                             if sec_match:
-                                sec_num, sec_body = sec_match.groups()
+                                sec_num, sec_body = sec_match.group(1, 2)
+                                current_section = sec_num
                                 sec_body = sec_body.strip()
                                 parts = re.split(r'\s*(?=\(\d+\))', sec_body, maxsplit=1)
                                 section_title = parts[0].strip()
-                                current_p = add_styled_paragraph(doc, f"Section {sec_num}: {section_title}", "Heading 3")
+                                new_blocks.append(paragraph(f"Section {sec_num}: {section_title}", "Heading 3"))
                                 if len(parts) > 1:
                                     first_subsection_text = parts[1].strip()
                                     sub_match = re.match(r'^\((\d+)\)\s*(.*)', first_subsection_text)
@@ -447,30 +1514,29 @@ def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
                                         # Check if this is a lettered subsection like (a), (b)
                                         if re.match(r'^[a-z]$', sub_num):
                                             is_within_subsection = True
-                                            current_p = add_styled_paragraph(doc, f"({sub_num}) {sub_title.strip()}", "Heading 4")
+                                            new_blocks.append(paragraph(f"({sub_num}) {sub_title.strip()}", "Heading 4"))
                                             document_stats["headings"]["h4"] += 1
                                         else:
                                             # If we're inside a lettered subsection, treat numbered items as normal text
                                             if is_within_subsection:
-                                                current_p = add_styled_paragraph(doc, f"({sub_num}) {sub_title.strip()}", "Normal")
+                                                new_blocks.append(paragraph(f"({sub_num}) {sub_title.strip()}", "Normal"))
                                             else:
                                                 # Format long subsections with the number separated from content
-                                                current_p = add_styled_paragraph(doc, f"Subsection ({sub_num}):", "Heading 4")
+                                                new_blocks.append(paragraph(f"Subsection ({sub_num}):", "Heading 4"))
                                                 document_stats["headings"]["h4"] += 1
-                                                current_p = add_styled_paragraph(doc, f"{sub_title.strip()}", "Normal")
-                                                tag = "Normal"
+                                                new_blocks.append(paragraph(f"{sub_title.strip()}", "Normal"))
                                     else:
-                                        current_p = add_styled_paragraph(doc, first_subsection_text, "Normal")
-                                        tag = "Normal"
+                                        new_blocks.append(paragraph(first_subsection_text, "Normal"))
                             elif symbol_sec_match:
-                                symbol, sec_num, sec_body = symbol_sec_match.groups()
+                                symbol, sec_num, sec_body = symbol_sec_match.group(1, 2, 3)
                                 sec_body = sec_body.strip()
                                 section_format = f"{symbol}{sec_num}"
+                                current_section = section_format
                                 
                                 parts = re.split(r'\s*(?=\(\d+\))', sec_body, maxsplit=1)
                                 section_title = parts[0].strip()
                                 
-                                current_p = add_styled_paragraph(doc, f"Section {section_format}: {section_title}", "Heading 3")
+                                new_blocks.append(paragraph(f"Section {section_format}: {section_title}", "Heading 3"))
                                 
                                 if len(parts) > 1:
                                     first_subsection_text = parts[1].strip()
@@ -479,50 +1545,168 @@ def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
                                         sub_num, sub_text = sub_match.groups()
                                         # Check if we're inside a lettered subsection
                                         if is_within_subsection:
-                                            current_p = add_styled_paragraph(doc, f"({sub_num}) {sub_text.strip()}", "Normal")
-                                            tag = "Normal"
+                                            new_blocks.append(paragraph(f"({sub_num}) {sub_text.strip()}", "Normal"))
                                         else:
                                             # Format long subsections with the number separated from content
-                                            current_p = add_styled_paragraph(doc, f"Subsection ({sub_num}):", "Heading 4")
+                                            new_blocks.append(paragraph(f"Subsection ({sub_num}):", "Heading 4"))
                                             document_stats["headings"]["h4"] += 1
-                                            current_p = add_styled_paragraph(doc, f"{sub_text.strip()}", "Normal")
-                                            tag = "Normal"
+                                            new_blocks.append(paragraph(f"{sub_text.strip()}", "Normal"))
                                     else:
-                                        current_p = add_styled_paragraph(doc, first_subsection_text, "Normal")
-                                        tag = "Normal"
+                                        new_blocks.append(paragraph(first_subsection_text, "Normal"))
                             elif symbol_list_match:
                                 # Handle list items with symbols
-                                symbol, list_num, list_text = symbol_list_match.groups()
-                                current_p = add_styled_paragraph(doc, f"{symbol} ({list_num}) {list_text.strip()}", "Normal")
-                                tag = "Normal"
+                                symbol, list_num, list_text = symbol_list_match.group(1, 2, 3)
+                                new_blocks.append(paragraph(f"{symbol} ({list_num}) {list_text.strip()}", "Normal"))
                             else:
-                                current_p = add_styled_paragraph(doc, line_after_url_removal, "Heading 3")
+                                new_blocks.append(paragraph(line_after_url_removal, "Heading 3"))
                         elif tag == "Heading 2":
                             document_stats["headings"]["h2"] += 1
-                            chap_match = re.match(r'^Chapter\s*[-–]?\s*(\d+)\s*(.*)', line_after_url_removal, re.I)
+                            chap_match = match_layout(rules, "chapter", line_after_url_removal)
                             if chap_match:
-                                chap_num, chap_title = chap_match.groups()
+                                chap_num, chap_title = chap_match.group(1, 2)
+                                current_chapter = chap_num.strip()
+                                current_section = None
                                 full_title = f"Chapter {chap_num.strip()}: {chap_title.strip()}"
-                                current_p = add_styled_paragraph(doc, full_title, "Heading 2")
+                                new_blocks.append(paragraph(full_title, "Heading 2"))
                             else:
-                                current_p = add_styled_paragraph(doc, line_after_url_removal, "Heading 2")
+                                new_blocks.append(paragraph(line_after_url_removal, "Heading 2"))
                         elif tag == "Heading 1":
                             document_stats["headings"]["h1"] += 1
-                            current_p = add_styled_paragraph(doc, line_after_url_removal, tag)
+                            new_blocks.append(paragraph(line_after_url_removal, tag))
                         else:
                             if tag == "Title":
                                 document_stats["headings"]["title"] += 1
                             elif tag == "Subtitle":
                                 document_stats["headings"]["subtitle"] += 1
-                            current_p = add_styled_paragraph(doc, line_after_url_removal, tag)
+                            new_blocks.append(paragraph(line_after_url_removal, tag))
                     elif tag == "Normal":
-                        current_p = add_styled_paragraph(doc, line_after_url_removal, "Normal", is_under_h5=is_within_heading_5)
-
-                    if current_p:
-                        last_p = current_p
-                        last_tag = tag
-                    
-                    i += 1
+                        new_blocks.append(paragraph(line_after_url_removal, "Normal"))
+            
+            # A new paragraph releases everything held before it
+            for block in new_blocks:
+                yield from held_blocks
+                held_blocks = [block]
+    
+    yield from held_blocks
+
+# Lines that start a new paragraph even when the previous line looks unfinished:
+# numbered/lettered items, list symbols and notes
+PARAGRAPH_START_PATTERN = re.compile(r'^(\(?\d{1,3}[A-Za-z]?[).]|\(?[A-Za-z]{1,4}\)|[♦◉•]|Notes?\s*:|Explanation\s*:)', re.I)
+
+def is_paragraph_continuation(previous_text, text):
+    """Check whether a line continues the paragraph before it (a wrapped PDF line)"""
+    if not previous_text or not text:
+        return False
+    if PARAGRAPH_START_PATTERN.match(text):
+        return False
+    if text[0].islower():
+        return True
+    return not previous_text.endswith(('.', ':', ';', '?', '!'))
+
+def join_wrapped_lines(previous_text, text):
+    """Join a wrapped line to its paragraph, undoing end-of-line hyphenation"""
+    if re.search(r'[A-Za-z]-$', previous_text):
+        if text[0].islower():
+            return previous_text[:-1] + text
+        return previous_text + text
+    return f"{previous_text} {text}"
+
+def reflow_blocks(blocks, document_stats=None):
+    """Join wrapped lines of body text into whole paragraphs
+
+    Consecutive Normal paragraphs are merged when the second one continues
+    the first (see is_paragraph_continuation), including across page
+    breaks. Headings, tables and empty lines end a paragraph. Text inside a
+    Schedule is left alone: its lists and forms rarely end in punctuation.
+    """
+    pending = None
+    for block in blocks:
+        if pending is not None and block["type"] == "paragraph" and block["tag"] == "Normal" \
+                and not block["under_h5"] \
+                and is_paragraph_continuation(pending["text"], block["text"]):
+            pending["text"] = join_wrapped_lines(pending["text"], block["text"])
+            if document_stats is not None:
+                document_stats["lines_reflowed"] += 1
+            continue
+        if pending is not None:
+            yield pending
+            pending = None
+        if block["type"] == "paragraph" and block["tag"] == "Normal" and block["text"] and not block["under_h5"]:
+            pending = block
+        else:
+            yield block
+    if pending is not None:
+        yield pending
+
+def iter_blocks(pdf_path, progress_callback=None, reflow=True, remove_running_lines=False, rule_pack=None):
+    """Yield classified blocks of a PDF lazily, without building a DOCX document
+
+    Uses the same rules as convert_pdf_to_docx; see iter_document_blocks for
+    the shape of the blocks. Pages are read one by one as blocks are
+    consumed, unless remove_running_lines is set: then the whole PDF is
+    extracted before the first block. rule_pack overrides the configured
+    rule_pack setting.
+    """
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        blocks = iter_document_blocks(pdf, progress_callback=progress_callback, pdf_path=pdf_path,
+                                      remove_running_lines=remove_running_lines, rule_pack=rule_pack)
+        if reflow:
+            blocks = reflow_blocks(blocks)
+        yield from blocks
+
+def build_document(pdf_path, progress_callback=None, reflow=True, rule_pack=None):
+    """Extract, classify and render a PDF into an in-memory DOCX document"""
+    import pdfplumber
+    from docx import Document
+    
+    doc = Document()
+    all_tables = []
+    document_stats = new_document_stats()
+    started = time.time()
+    
+    # Create backup of the original document
+    create_document_backup(pdf_path)
+    
+    # Validate PDF before processing
+    is_valid, validation_message = validate_pdf(pdf_path)
+    if not is_valid:
+        return None, validation_message, document_stats
+    
+    try:
+        logging.info(f"Starting conversion of: {os.path.basename(pdf_path)}")
+        
+        with pdfplumber.open(pdf_path) as pdf:
+            total_pages = len(pdf.pages)
+            document_stats["total_pages"] = total_pages
+            logging.info(f"PDF has {total_pages} pages")
+            
+            # Render each classified block
+            blocks = iter_document_blocks(pdf, document_stats, progress_callback, pdf_path,
+                                          config.get("remove_running_lines", True), rule_pack)
+            if reflow:
+                blocks = reflow_blocks(blocks, document_stats)
+            if search_index_path:
+                blocks = index_blocks(blocks, pdf_path, search_index_path)
+            for block in blocks:
+                if abort_processing:
+                    logging.warning(f"Processing aborted for {pdf_path}")
+                    return None, "Processing aborted by user", document_stats
+                
+                if block["type"] == "table":
+                    add_table_to_doc(doc, block["rows"])
+                    all_tables.append(block["rows"])  # Store table data for later reference
+                    continue
+                
+                # Lines merged into a paragraph (dates under "Date of ...") become line breaks
+                first_line, *extra_lines = block["text"].split("\n")
+                p = add_styled_paragraph(doc, first_line, block["tag"], is_under_h5=block["under_h5"])
+                document_stats["paragraphs_rendered"] += 1
+                for extra_line in extra_lines:
+                    p.add_run(f"\n{extra_line}")
+            if abort_processing:
+                logging.warning(f"Processing aborted for {pdf_path}")
+                return None, "Processing aborted by user", document_stats
             
             # Add any tables that were detected but not already processed
             if all_tables:
@@ -537,50 +1721,463 @@ def convert_pdf_to_docx(pdf_path, output_dir=None, progress_callback=None):
         # Add document metadata
         doc.core_properties.title = os.path.basename(os.path.splitext(pdf_path)[0])
         doc.core_properties.created = datetime.now()
-        doc.core_properties.comments = f"Converted from PDF by Structured Document Converter v2.0"
+        doc.core_properties.comments = f"Converted from PDF by Structured Document Converter v{APP_VERSION}"
+
+        document_stats["timings"]["render"] = (time.time() - started - document_stats["timings"]["extract"]
+                                               - document_stats["timings"]["ocr"])
+        return doc, "Success", document_stats
+        
+    except Exception as e:
+        error_msg = f"Error processing: {pdf_path} - {str(e)}"
+        log_error(error_msg, e)
+        return None, error_msg, document_stats
 
-        # Determine output path
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-            output_filename = os.path.basename(os.path.splitext(pdf_path)[0]) + "_structured.docx"
-            output_path = os.path.join(output_dir, output_filename)
+# ---------------------------------------------------------------------------
+# Lightweight output writers: stream classified blocks straight to disk
+# ---------------------------------------------------------------------------
+
+# Output format -> suffix of the output file
+OUTPUT_FORMATS = {
+    "docx": "_structured.docx",
+    "markdown": "_structured.md",
+    "html": "_structured.html",
+    "json": "_structured.json"
+}
+MARKDOWN_PREFIXES = {
+    "Title": "# ", "Heading 1": "## ", "Heading 2": "### ", "Heading 3": "#### ",
+    "Heading 4": "##### ", "Heading 5": "###### "
+}
+HTML_ELEMENTS = {
+    "Title": "h1", "Heading 1": "h2", "Heading 2": "h3", "Heading 3": "h4",
+    "Heading 4": "h5", "Heading 5": "h6"
+}
+
+def write_markdown_blocks(f, blocks, title, document_stats):
+    """Write blocks as Markdown, one block at a time"""
+    for block in blocks:
+        if block["type"] == "table":
+            rows = [[cell.replace("|", "\\|") for cell in row] for row in block["rows"]]
+            width = max(len(row) for row in rows)
+            rows = [row + [""] * (width - len(row)) for row in rows]
+            f.write("| " + " | ".join(rows[0]) + " |\n")
+            f.write("|" + " --- |" * width + "\n")
+            for row in rows[1:]:
+                f.write("| " + " | ".join(row) + " |\n")
+            f.write("\n")
+        elif block["text"]:
+            text = block["text"].replace("\n", "  \n")  # Markdown hard line break
+            if block["tag"] == "Subtitle":
+                f.write(f"*{text}*\n\n")
+            else:
+                f.write(f"{MARKDOWN_PREFIXES.get(block['tag'], '')}{text}\n\n")
+
+def write_html_blocks(f, blocks, title, document_stats):
+    """Write blocks as a standalone HTML page, one block at a time"""
+    f.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+            f'<title>{html.escape(title)}</title>\n</head>\n<body>\n')
+    for block in blocks:
+        if block["type"] == "table":
+            f.write("<table>\n")
+            for row in block["rows"]:
+                f.write("<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>\n")
+            f.write("</table>\n")
+            continue
+        text = "<br>\n".join(html.escape(line) for line in block["text"].split("\n"))
+        if block["tag"] in HTML_ELEMENTS:
+            element = HTML_ELEMENTS[block["tag"]]
+            f.write(f"<{element}>{text}</{element}>\n")
+        elif block["tag"] == "Subtitle":
+            f.write(f'<p class="subtitle"><em>{text}</em></p>\n')
+        elif block["under_h5"]:
+            f.write(f'<p class="schedule">{text}</p>\n')
         else:
-            output_path = os.path.splitext(pdf_path)[0] + "_structured.docx"
-            
-        # Final progress update
-        if progress_callback:
-            progress_callback(total_pages, total_pages, "Saving document...")
-            
-        # Save document with error handling
-        try:
-            doc.save(output_path)
-        except Exception as e:
-            log_error(f"Failed to save document {output_path}", e)
-            return None, f"Failed to save document: {str(e)}", document_stats
-            
-        # Verify output document
-        if not os.path.exists(output_path) or os.path.getsize(output_path) < 1000:  # Arbitrary minimum size
-            log_error(f"Output document verification failed for {output_path}: File too small or missing")
-            return None, "Output document verification failed", document_stats
-            
-        # Log success
+            f.write(f"<p>{text}</p>\n")
+    f.write("</body>\n</html>\n")
+
+def write_json_blocks(f, blocks, title, document_stats):
+    """Write blocks as a JSON document, one block at a time
+
+    The statistics are written after the blocks, once they are complete.
+    """
+    f.write('{\n"title": ' + json.dumps(title) + ',\n"blocks": [\n')
+    for i, block in enumerate(blocks):
+        if i:
+            f.write(",\n")
+        f.write(json.dumps(block, ensure_ascii=False))
+    f.write('\n],\n"document_statistics": ' + json.dumps(document_stats) + "\n}\n")
+
+OUTPUT_WRITERS = {
+    "markdown": write_markdown_blocks,
+    "html": write_html_blocks,
+    "json": write_json_blocks
+}
+
+def convert_pdf_to_text_format(pdf_path, output_dir=None, output_format="markdown", progress_callback=None, reflow=True,
+                               rule_pack=None):
+    """Convert PDF to Markdown, HTML or JSON without building a document in memory
+
+    Blocks are written to disk as they are classified; the file is written
+    under a temporary name and renamed into place when complete.
+    """
+    import pdfplumber
+    
+    writer = OUTPUT_WRITERS[output_format]
+    document_stats = new_document_stats()
+    started = time.time()
+    
+    # Create backup of the original document
+    create_document_backup(pdf_path)
+    
+    # Validate PDF before processing
+    is_valid, validation_message = validate_pdf(pdf_path)
+    if not is_valid:
+        return None, validation_message, document_stats
+    
+    output_path = get_output_path(pdf_path, output_dir, output_format)
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    
+    def blocks_until_aborted(blocks):
+        for block in blocks:
+            if abort_processing:
+                return
+            yield block
+    
+    try:
+        logging.info(f"Starting {output_format} conversion of: {os.path.basename(pdf_path)}")
+        with pdfplumber.open(pdf_path) as pdf:
+            document_stats["total_pages"] = len(pdf.pages)
+            blocks = iter_document_blocks(pdf, document_stats, progress_callback, pdf_path,
+                                          config.get("remove_running_lines", True), rule_pack)
+            if reflow:
+                blocks = reflow_blocks(blocks, document_stats)
+            if search_index_path:
+                blocks = index_blocks(blocks, pdf_path, search_index_path)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                title = os.path.basename(os.path.splitext(pdf_path)[0])
+                writer(f, blocks_until_aborted(blocks), title, document_stats)
+        
+        if abort_processing:
+            os.remove(temp_path)
+            logging.warning(f"Processing aborted for {pdf_path}")
+            return None, "Processing aborted by user", document_stats
+        
+        os.replace(temp_path, output_path)
+        document_stats["timings"]["render"] = (time.time() - started - document_stats["timings"]["extract"]
+                                               - document_stats["timings"]["ocr"])
         logging.info(f"Successfully converted: {pdf_path} to {output_path}")
         logging.info(f"Document statistics: {json.dumps(document_stats)}")
-        
         return output_path, "Success", document_stats
-        
+    
     except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         error_msg = f"Error processing: {pdf_path} - {str(e)}"
         log_error(error_msg, e)
         return None, error_msg, document_stats
 
+def convert_pdf(pdf_path, output_dir=None, output_format="docx", progress_callback=None, reflow=True,
+                compression=None, rule_pack=None):
+    """Convert a PDF to one of OUTPUT_FORMATS; compression only applies to DOCX
+
+    compression and rule_pack override the configured docx_compression and rule_pack when given.
+    """
+    if output_format == "docx":
+        return convert_pdf_to_docx(pdf_path, output_dir, progress_callback, reflow, compression, rule_pack)
+    return convert_pdf_to_text_format(pdf_path, output_dir, output_format, progress_callback, reflow, rule_pack)
+
+def verify_output_integrity(output_path, stats):
+    """Verify a converted file; DOCX structure is checked, other formats must be non-empty"""
+    if output_path.endswith(".docx"):
+        return verify_docx_integrity(output_path, stats)
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return False, "Output file is empty or missing"
+    return True, "Output file written"
+
+# ---------------------------------------------------------------------------
+# Section search index: SQLite FTS5, fed from the block stream of conversions
+# ---------------------------------------------------------------------------
+
+SEARCH_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(
+    act_title, chapter, section, heading, text, source UNINDEXED, page UNINDEXED
+);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    source TEXT PRIMARY KEY,
+    file_hash TEXT,
+    act_title TEXT,
+    sections INTEGER,
+    indexed_at TEXT
+);
+"""
+
+SEARCH_INDEX_JOURNAL_MODES = ("delete", "truncate", "persist", "wal")
+
+def open_search_index(index_path):
+    """Open (and create if needed) the section search index"""
+    connection = sqlite3.connect(index_path, timeout=30)
+    # Rollback journal by default, like the broker: broker workers on several hosts may share one index, and
+    # WAL needs shared memory, which network mounts lack. "wal" only for an index on a local disk.
+    journal_mode = str(config.get("search_index_journal_mode", "delete")).lower()
+    if journal_mode not in SEARCH_INDEX_JOURNAL_MODES:
+        journal_mode = "delete"
+    connection.execute(f"PRAGMA journal_mode={journal_mode}")
+    connection.executescript(SEARCH_INDEX_SCHEMA)
+    return connection
+
+def index_blocks(blocks, pdf_path, index_path):
+    """Pass blocks through while indexing them by Act, chapter and section
+
+    One row is written per section (or per chapter/front matter outside
+    sections). Rows are collected in memory and replace the file's previous
+    rows in one short transaction once the block stream is complete, so
+    aborted or failed conversions leave the index unchanged and concurrent
+    workers only hold the write lock briefly. Indexing errors are logged
+    and never fail the conversion.
+    """
+    act_title = ""
+    current = None  # [chapter, section, heading, page, text parts] of the row being collected
+    rows = []
+    
+    def flush():
+        if current and (current[2] or current[4]):
+            rows.append((current[0] or "", current[1] or "", current[2], "\n".join(current[4]), current[3]))
+    
+    for block in blocks:
+        if current is None or (block["chapter"], block["section"]) != (current[0], current[1]):
+            flush()
+            current = [block["chapter"], block["section"], "", block["page"], []]
+        if block["type"] == "table":
+            current[4].extend(" ".join(row) for row in block["rows"])
+        elif block["tag"] == "Title" and not act_title:
+            act_title = block["text"]
+        elif block["tag"].startswith("Heading") and not current[2]:
+            current[2] = block["text"]
+        elif block["text"]:
+            current[4].append(block["text"])
+        yield block
+    flush()
+    if abort_processing:
+        return
+    write_index_rows(pdf_path, index_path, act_title, rows)
+
+def write_index_rows(pdf_path, index_path, act_title, rows):
+    """Replace the indexed sections of a PDF in one short write transaction"""
+    source = os.path.abspath(pdf_path)
+    try:
+        file_hash = calculate_file_hash(pdf_path)
+        connection = open_search_index(index_path)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM sections WHERE source = ?", (source,))
+            connection.executemany(
+                "INSERT INTO sections (act_title, chapter, section, heading, text, source, page) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(act_title, chapter, section, heading, text, source, page) for chapter, section, heading, text, page in rows])
+            connection.execute(
+                "INSERT OR REPLACE INTO indexed_files (source, file_hash, act_title, sections, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (source, file_hash, act_title, len(rows), datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        logging.info(f"Indexed {len(rows)} sections of {pdf_path} in {index_path}")
+    except Exception as e:
+        log_error(f"Error indexing {pdf_path} in {index_path}", e)
+
+def quote_fts_phrase(text):
+    """Quote text as an FTS5 phrase"""
+    return '"' + text.replace('"', '""') + '"'
+
+def search_index(query=None, section=None, act=None, index_path=None, limit=20):
+    """Search the section index; returns matching sections, best first"""
+    index_path = index_path or search_index_path
+    terms = []
+    if query:
+        terms.append(f"{{heading text}} : {quote_fts_phrase(query)}")
+    if section:
+        terms.append(f"section : {quote_fts_phrase(section)}")
+    if act:
+        terms.append(f"act_title : {quote_fts_phrase(act)}")
+    if not terms:
+        return []
+    connection = sqlite3.connect(index_path, timeout=30)
+    try:
+        cursor = connection.execute(
+            "SELECT act_title, chapter, section, heading, page, source, "
+            "snippet(sections, 4, '[', ']', '...', 16) FROM sections WHERE sections MATCH ? "
+            "ORDER BY rank LIMIT ?", (" AND ".join(terms), limit))
+        return [{"act_title": row[0], "chapter": row[1], "section": row[2], "heading": row[3],
+                 "page": row[4], "source": row[5], "snippet": row[6]} for row in cursor]
+    finally:
+        connection.close()
+
+def run_search(args):
+    """Print search results for the --search command line"""
+    started = time.perf_counter()
+    results = search_index(args.search or None, args.section, args.act, args.index, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    for result in results:
+        location = ", ".join(part for part in (
+            f"Chapter {result['chapter']}" if result["chapter"] else "",
+            f"Section {result['section']}" if result["section"] else "",
+            f"page {result['page']}") if part)
+        print(f"{result['act_title']} ({location})")
+        if result["heading"]:
+            print(f"    {result['heading']}")
+        if result["snippet"]:
+            print(f"    {result['snippet']}")
+        print(f"    {result['source']}")
+    print(f"{len(results)} result(s) in {elapsed:.1f} ms")
+
+# ---------------------------------------------------------------------------
+# Near-duplicate detection: MinHash signatures of a few sampled pages
+# ---------------------------------------------------------------------------
+
+DEDUP_SAMPLE_PAGES = 4  # First two, middle and last page
+DEDUP_SHINGLE_WORDS = 5
+DEDUP_PERMUTATIONS = 64
+DEDUP_BANDS = 16  # Locality-sensitive hashing: DEDUP_PERMUTATIONS / DEDUP_BANDS rows per band
+DEDUP_PRIME = (1 << 61) - 1
+_dedup_random = random.Random(20250428)
+DEDUP_HASH_PARAMS = [(_dedup_random.randrange(1, DEDUP_PRIME), _dedup_random.randrange(0, DEDUP_PRIME))
+                     for _ in range(DEDUP_PERMUTATIONS)]
+
+def normalize_for_dedup(text):
+    """Reduce page text to comparable words: no translation markers, URLs or case
+
+    Numbers are kept, so annual Acts that differ in years and amounts stay apart.
+    """
+    text = re.sub(r'\((Official|Unofficial)\s+Translation\)', ' ', text, flags=re.I)
+    text = re.sub(r'(?:https?://|www\.)\S+', ' ', text)
+    return re.findall(r'\w+', text.lower())
+
+def compute_document_signature(pdf_path):
+    """MinHash signature of a PDF's sampled pages; returns (signature, page count)
+
+    The signature is None when the sampled pages have no text to compare.
+    """
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        sample = sorted({0, 1, page_count // 2, page_count - 1} & set(range(page_count)))[:DEDUP_SAMPLE_PAGES]
+        words = []
+        for page_idx in sample:
+            words.extend(normalize_for_dedup(pdf.pages[page_idx].extract_text() or ""))
+    shingles = {" ".join(words[i:i + DEDUP_SHINGLE_WORDS]) for i in range(max(len(words) - DEDUP_SHINGLE_WORDS + 1, 0))}
+    if not shingles:
+        return None, page_count
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+              for shingle in shingles]
+    signature = tuple(min((a * h + b) % DEDUP_PRIME for h in hashes) for a, b in DEDUP_HASH_PARAMS)
+    return signature, page_count
+
+def signature_similarity(first, second):
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+def group_near_duplicates(signatures, threshold=0.8, page_counts=None):
+    """Group documents whose signatures are at least threshold similar
+
+    signatures maps path -> signature (in batch order). Returns a dict of
+    representative path -> [(duplicate path, similarity), ...]; the
+    representative of a group is its longest document, then the earliest.
+    """
+    page_counts = page_counts or {}
+    paths = [path for path, signature in signatures.items() if signature is not None]
+    rows = DEDUP_PERMUTATIONS // DEDUP_BANDS
+    
+    # Candidate pairs share at least one band of the signature
+    buckets = collections.defaultdict(list)
+    for path in paths:
+        signature = signatures[path]
+        for band in range(DEDUP_BANDS):
+            buckets[(band, signature[band * rows:(band + 1) * rows])].append(path)
+    
+    parent = {path: path for path in paths}
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+    
+    checked = set()
+    for bucket in buckets.values():
+        for i, first in enumerate(bucket):
+            for second in bucket[i + 1:]:
+                if (first, second) in checked:
+                    continue
+                checked.add((first, second))
+                if signature_similarity(signatures[first], signatures[second]) >= threshold:
+                    parent[find(second)] = find(first)
+    
+    members = collections.defaultdict(list)
+    for path in paths:
+        members[find(path)].append(path)
+    groups = {}
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        representative = max(group, key=lambda path: (page_counts.get(path, 0), -paths.index(path)))
+        groups[representative] = [(path, signature_similarity(signatures[representative], signatures[path]))
+                                  for path in group if path != representative]
+    return groups
+
+def find_near_duplicates(pdf_paths, threshold=0.8):
+    """Find groups of near-duplicate PDFs; see group_near_duplicates"""
+    signatures, page_counts = {}, {}
+    for path in pdf_paths:
+        try:
+            signatures[path], page_counts[path] = compute_document_signature(path)
+        except Exception as e:
+            log_error(f"Failed to compute duplicate signature for {path}", e)
+    return group_near_duplicates(signatures, threshold, page_counts)
+
+def settle_duplicates(job, output_path):
+    """Link the duplicates of a representative to its output, or queue the next one if it failed
+
+    job is the conversion_queue item of the representative; a successor is queued with the same settings.
+    """
+    representative, output_dir = job[0], job[1]
+    if output_path:
+        write_duplicate_reports(representative, output_dir, output_path)
+        return
+    group = duplicate_groups.pop(representative, [])
+    if not group or abort_processing:
+        return
+    successor = group[0][0]
+    duplicate_groups[successor] = [(path, signature_similarity(duplicate_signatures[successor], duplicate_signatures[path]))
+                                   for path, _ in group[1:]]
+    logging.info(f"{os.path.basename(representative)} failed; converting its near-duplicate {os.path.basename(successor)}")
+    root.after(0, lambda p=successor: update_file_status(p, "black"))
+    conversion_queue.put(((successor,) + tuple(job[1:]), file_priorities.get(successor, "normal"), "gui"))
+
+def write_duplicate_reports(representative, output_dir, output_path):
+    """Link the duplicates of a converted representative to its output"""
+    for duplicate, similarity in duplicate_groups.get(representative, []):
+        report_dir = os.path.dirname(duplicate) if not output_dir else output_dir
+        report_path = os.path.join(report_dir, os.path.splitext(os.path.basename(duplicate))[0] + "_duplicate_report.json")
+        with open(report_path, 'w') as f:
+            json.dump({
+                "source_file": duplicate,
+                "conversion_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "status": "duplicate",
+                "duplicate_of": representative,
+                "similarity": round(similarity, 3),
+                "output_file": output_path
+            }, f, indent=4)
+        logging.info(f"≡ {os.path.basename(duplicate)} - Near-duplicate of {os.path.basename(representative)}, not converted")
+
 def verify_docx_integrity(docx_path, stats):
     """Verify that the DOCX file has expected structure based on stats"""
+    from docx import Document
     try:
-        doc = Document(docx_path)
+        # A document this process just saved is verified from memory instead of being read back
+        data = take_packaged_document(docx_path)
+        doc = Document(io.BytesIO(data) if data is not None else docx_path)
         
-        # Check basic structure
-        if len(doc.paragraphs) < 10:  # Arbitrary minimum
+        # Check basic structure: at least 10 paragraphs, or all of them for a short (or reflowed) document
+        if len(doc.paragraphs) < max(1, min(10, stats.get("paragraphs_rendered", 10))):
             return False, "Document has too few paragraphs"
             
         # Count headings to verify against stats
@@ -617,102 +2214,286 @@ def verify_docx_integrity(docx_path, stats):
         log_error(f"Document verification failed for {docx_path}", e)
         return False, f"Document verification error: {str(e)}"
 
+def load_timing_history():
+    """Load historical conversion speed from previous runs"""
+    global timing_history
+    if timing_history is None:
+        timing_history = {"seconds_per_page": DEFAULT_SECONDS_PER_PAGE, "samples": 0}
+        if os.path.exists(timing_history_path):
+            try:
+                with open(timing_history_path, 'r') as f:
+                    timing_history.update(json.load(f))
+            except Exception as e:
+                log_error("Failed to load timing history", e)
+    return timing_history
+
+def save_timing_history():
+    """Persist historical conversion speed for future runs"""
+    if timing_history is None:
+        return
+    try:
+        with open(timing_history_path, 'w') as f:
+            json.dump(timing_history, f, indent=4)
+    except Exception as e:
+        log_error("Failed to save timing history", e)
+
+def record_conversion_timing(pages, seconds):
+    """Fold the speed of a finished conversion into the seconds-per-page average"""
+    if pages <= 0:
+        return
+    history = load_timing_history()
+    sample = seconds / pages
+    if history["samples"] == 0:
+        history["seconds_per_page"] = sample
+    else:
+        # Exponential moving average so the estimate follows hardware/version changes
+        history["seconds_per_page"] = 0.8 * history["seconds_per_page"] + 0.2 * sample
+    history["samples"] += 1
+
+def estimate_conversion_cost(page_count):
+    """Estimate conversion time in seconds from a page count"""
+    return max(page_count, 1) * load_timing_history()["seconds_per_page"]
+
+def plan_conversion_order(pdf_paths, page_counts, workers=1):
+    """Order files largest-first and predict the batch makespan
+
+    Returns the ordered paths and the predicted duration in seconds. Workers
+    that take the next file from a shared queue in this order perform
+    longest-processing-time-first scheduling, so a large Act never ends up
+    as the tail the whole batch waits on.
+    """
+    costs = {path: estimate_conversion_cost(page_counts.get(path, 0)) for path in pdf_paths}
+    ordered = sorted(pdf_paths, key=lambda path: costs[path], reverse=True)
+    
+    # Simulate the workers to predict when the last one finishes
+    finish_times = [0.0] * max(workers, 1)
+    for path in ordered:
+        earliest = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, earliest + costs[path])
+    return ordered, max(finish_times)
+
+def format_duration(seconds):
+    """Format a duration in seconds for display"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+def get_report_path(pdf_path, output_dir, output_path):
+    """Determine where the conversion report of a file is written"""
+    if output_path:
+        return os.path.splitext(output_path)[0] + "_report.json"
+    report_dir = os.path.dirname(pdf_path) if not output_dir else output_dir
+    return os.path.join(report_dir, os.path.splitext(os.path.basename(pdf_path))[0] + "_error_report.json")
+
+def build_conversion_report(pdf_path, output_path, status_msg, doc_stats, is_valid=False, verify_msg=None):
+    """Build the conversion report of a converted or failed file"""
+    if not output_path:
+        return {
+            "source_file": pdf_path,
+            "conversion_attempt_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "status": "error",
+            "error_message": status_msg,
+            "partial_document_statistics": doc_stats
+        }
+    if is_valid:
+        return {
+            "source_file": pdf_path,
+            "output_file": output_path,
+            "conversion_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "status": "success",
+            "document_statistics": doc_stats,
+            "verification": "passed"
+        }
+    return {
+        "source_file": pdf_path,
+        "output_file": output_path,
+        "conversion_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "status": "warning",
+        "warning_message": verify_msg,
+        "document_statistics": doc_stats,
+        "verification": "warning"
+    }
+
+def report_conversion_result(pdf_path, output_dir, output_path, status_msg, doc_stats):
+    """Verify a converted document, mark it in the file list and write its report"""
+    is_valid, verify_msg = False, None
+    if output_path:
+        # Verify the document
+        verify_started = time.time()
+        is_valid, verify_msg = verify_output_integrity(output_path, doc_stats)
+        doc_stats["timings"]["verify"] = time.time() - verify_started
+        if is_valid:
+            root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
+                file_listbox.get(0, tk.END).index(os.path.basename(p)), 
+                {'fg': 'green'}
+            ))
+            logging.info(f"✓ {os.path.basename(pdf_path)} - Converted successfully and verified")
+        else:
+            root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
+                file_listbox.get(0, tk.END).index(os.path.basename(p)), 
+                {'fg': 'orange'}
+            ))
+            logging.warning(f"⚠ {os.path.basename(pdf_path)} - Converted but verification failed: {verify_msg}")
+            
+            # If verification failed, notify user
+            root.after(0, lambda p=pdf_path, msg=verify_msg: messagebox.showwarning(
+                "Document Verification Warning", 
+                f"The document {os.path.basename(p)} was converted but failed verification: {msg}\n\nPlease review the output file manually."
+            ))
+    else:
+        root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
+            file_listbox.get(0, tk.END).index(os.path.basename(p)), 
+            {'fg': 'red'}
+        ))
+        logging.error(f"❌ {os.path.basename(pdf_path)} - Conversion failed: {status_msg}")
+    record_conversion_metrics(output_path, status_msg, doc_stats, is_valid)
+    
+    # Save report for successes, warnings and failures alike
+    report_path = get_report_path(pdf_path, output_dir, output_path)
+    with open(report_path, 'w') as f:
+        json.dump(build_conversion_report(pdf_path, output_path, status_msg, doc_stats, is_valid, verify_msg), f, indent=4)
+
+def document_writer(save_queue):
+    """Save, verify and report documents rendered by process_queue
+
+    Runs on its own thread so that zip compression and disk writes of one
+    document overlap with extraction and rendering of the next one.
+    """
+    while True:
+        item = save_queue.get()
+        if item is None:
+            save_queue.task_done()
+            break
+        
+        # output_path is where a DOCX is to be saved, or the file a streaming writer already wrote
+        job, doc, output_path, status_msg, doc_stats = item
+        pdf_path, output_dir, _, compression, _ = job
+        try:
+            if doc is not None:
+                output_path, status_msg, doc_stats = save_converted_document(
+                    doc, pdf_path, output_path, doc_stats, compression)
+            report_conversion_result(pdf_path, output_dir, output_path, status_msg, doc_stats)
+        except Exception as e:
+            log_error(f"Failed to save {pdf_path}", e)
+            root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
+                file_listbox.get(0, tk.END).index(os.path.basename(p)), 
+                {'fg': 'red'}
+            ))
+            output_path = None
+        finally:
+            settle_duplicates(job, output_path)
+            save_queue.task_done()
+
 def process_queue():
-    """Process files from the queue with progress updates"""
+    """Process files from the queue with progress updates
+
+    Rendered documents are handed to a writer thread through a bounded queue,
+    so at most SAVE_QUEUE_SIZE documents wait in memory for their save.
+    """
     global abort_processing
     
+    # A failed representative of near-duplicates queues its successor from the writer thread,
+    # so the queue is checked again once the writer has finished
     while not conversion_queue.empty() and not abort_processing:
-        pdf_path, output_dir = conversion_queue.get()
-        try:
-            # Update UI to show current file
-            root.after(0, lambda: update_status(f"Processing: {os.path.basename(pdf_path)}...", "blue"))
-            root.after(0, lambda: progress_bar.configure(value=0))
+        save_queue = queue.Queue(maxsize=SAVE_QUEUE_SIZE)
+        writer_thread = threading.Thread(target=document_writer, args=(save_queue,), daemon=True)
+        writer_thread.start()
+        
+        while not conversion_queue.empty() and not abort_processing:
+            job = conversion_queue.get()
+            pdf_path, output_dir, output_format, _, rule_pack = job
+            try:
+                # Update UI to show current file; priorities can change the queue, so the ETA is recomputed
+                remaining_cost = sum(estimate_conversion_cost(selected_page_counts.get(path, 0))
+                                     for path in [pdf_path] + [queued[0] for queued in conversion_queue.snapshot()])
+                eta = format_duration(remaining_cost)
+                root.after(0, lambda p=pdf_path, eta=eta: update_status(
+                    f"Processing: {os.path.basename(p)}... (about {eta} remaining)", "blue"))
+                root.after(0, lambda: progress_bar.configure(value=0))
             
-            # Process the file with progress updates
-            output_path, status_msg, doc_stats = convert_pdf_to_docx(
-                pdf_path, 
-                output_dir,
-                progress_callback=lambda current, total, msg: root.after(0, 
+                # Extract, classify and render the file with progress updates
+                started = time.time()
+                progress_callback = lambda current, total, msg: root.after(0, 
                     lambda c=current, t=total, m=msg: update_progress(c, t, m))
-            )
-            
-            if output_path:
-                # Verify the document
-                is_valid, verify_msg = verify_docx_integrity(output_path, doc_stats)
-                if is_valid:
-                    root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
-                        file_listbox.get(0, tk.END).index(os.path.basename(p)), 
-                        {'fg': 'green'}
-                    ))
-                    logging.info(f"✓ {os.path.basename(pdf_path)} - Converted successfully and verified")
-                    
-                    # Generate and save conversion report
-                    report_path = os.path.splitext(output_path)[0] + "_report.json"
-                    with open(report_path, 'w') as f:
-                        json.dump({
-                            "source_file": pdf_path,
-                            "output_file": output_path,
-                            "conversion_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            "status": "success",
-                            "document_statistics": doc_stats,
-                            "verification": "passed"
-                        }, f, indent=4)
+                reflow = config.get("reflow_paragraphs", True)
+                if output_format == "docx":
+                    doc, status_msg, doc_stats = build_document(pdf_path, progress_callback, reflow, rule_pack)
+                    output_path = get_output_path(pdf_path, output_dir) if doc is not None else None
                 else:
-                    root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
-                        file_listbox.get(0, tk.END).index(os.path.basename(p)), 
-                        {'fg': 'orange'}
-                    ))
-                    logging.warning(f"⚠ {os.path.basename(pdf_path)} - Converted but verification failed: {verify_msg}")
-                    
-                    # If verification failed, notify user
-                    root.after(0, lambda p=pdf_path, msg=verify_msg: messagebox.showwarning(
-                        "Document Verification Warning", 
-                        f"The document {os.path.basename(p)} was converted but failed verification: {msg}\n\nPlease review the output file manually."
-                    ))
-                    
-                    # Save report even for warnings
-                    report_path = os.path.splitext(output_path)[0] + "_report.json"
-                    with open(report_path, 'w') as f:
-                        json.dump({
-                            "source_file": pdf_path,
-                            "output_file": output_path,
-                            "conversion_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            "status": "warning",
-                            "warning_message": verify_msg,
-                            "document_statistics": doc_stats,
-                            "verification": "warning"
-                        }, f, indent=4)
-            else:
+                    # Streaming writers write the file while extracting; only reporting is left
+                    doc = None
+                    output_path, status_msg, doc_stats = convert_pdf_to_text_format(
+                        pdf_path, output_dir, output_format, progress_callback, reflow, rule_pack)
+                if doc is not None or output_path:
+                    record_conversion_timing(doc_stats["pages_processed"], time.time() - started)
+            
+                # Hand over to the writer; blocks while the writer is behind
+                save_queue.put((job, doc, output_path, status_msg, doc_stats))
+                
+            except Exception as e:
+                log_error(f"Failed to process {pdf_path}", e)
                 root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
                     file_listbox.get(0, tk.END).index(os.path.basename(p)), 
                     {'fg': 'red'}
                 ))
-                logging.error(f"❌ {os.path.basename(pdf_path)} - Conversion failed: {status_msg}")
-                
-                # Save failure report
-                report_dir = os.path.dirname(pdf_path) if not output_dir else output_dir
-                report_path = os.path.join(report_dir, os.path.splitext(os.path.basename(pdf_path))[0] + "_error_report.json")
-                with open(report_path, 'w') as f:
-                    json.dump({
-                        "source_file": pdf_path,
-                        "conversion_attempt_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        "status": "error",
-                        "error_message": status_msg,
-                        "partial_document_statistics": doc_stats
-                    }, f, indent=4)
-                
-        except Exception as e:
-            log_error(f"Failed to process {pdf_path}", e)
-            root.after(0, lambda p=pdf_path: file_listbox.itemconfig(
-                file_listbox.get(0, tk.END).index(os.path.basename(p)), 
-                {'fg': 'red'}
-            ))
-        finally:
-            conversion_queue.task_done()
+                settle_duplicates(job, None)
+            finally:
+                conversion_queue.task_done()
+    
+        # Let the writer finish the documents already rendered
+        save_queue.put(None)
+        writer_thread.join()
+    save_timing_history()
+    for line in format_queue_wait_stats("conversion"):
+        logging.info(f"Queue wait, {line}")
     
     # Update UI when all files are processed
     root.after(0, processing_complete)
 
+def run_batch(pdf_paths, output_dir, output_format, compression=None, rule_pack=None):
+    """Detect near-duplicates, queue the batch largest-first and process it
+
+    compression and rule_pack are the settings of the batch, or None for
+    docx_compression and rule_pack.
+    """
+    duplicate_groups.clear()
+    duplicate_signatures.clear()
+    if config.get("detect_duplicates", False) and len(pdf_paths) > 1:
+        signatures = {}
+        for i, path in enumerate(pdf_paths, 1):
+            if abort_processing:
+                return
+            root.after(0, lambda i=i: update_progress(i, len(pdf_paths), "Checking for duplicate documents..."))
+            try:
+                signatures[path] = duplicate_signatures[path] = compute_document_signature(path)[0]
+            except Exception as e:
+                log_error(f"Failed to compute duplicate signature for {path}", e)
+        duplicate_groups.update(group_near_duplicates(
+            signatures, config.get("duplicate_threshold", 0.8), selected_page_counts))
+        
+        # Convert one representative per group; its duplicates are linked once it is done
+        duplicates = {path for group in duplicate_groups.values() for path, _ in group}
+        for path in duplicates:
+            root.after(0, lambda p=path: update_file_status(p, "gray"))
+        pdf_paths = [path for path in pdf_paths if path not in duplicates]
+        if duplicates:
+            logging.info(f"Skipping {len(duplicates)} near-duplicate file(s)")
+    
+    # Add files to the queue, largest first within each priority (files are converted on one thread)
+    ordered_paths, predicted_duration = plan_conversion_order(pdf_paths, selected_page_counts)
+    for path in ordered_paths:
+        conversion_queue.put(((path, output_dir, output_format, compression, rule_pack),
+                              file_priorities.get(path, "normal"), "gui"))
+    root.after(0, lambda: update_status(
+        f"Starting conversion... (estimated {format_duration(predicted_duration)})", "blue"))
+    
+    process_queue()
+
 def update_progress(current, total, message=""):
     """Update progress bar and status"""
     if total > 0:
@@ -742,16 +2523,18 @@ def start_processing():
     # Clear any previous abort flag
     abort_processing = False
     
-    # Add files to the queue
-    for path in selected_pdf_paths:
-        conversion_queue.put((path, output_dir_var.get() if output_dir_var.get() else None))
-        
     # Update UI
     update_status("Starting conversion...", "blue")
     progress_bar["value"] = 0
     
     # Start processing thread
-    processing_thread = threading.Thread(target=process_queue, daemon=True)
+    output_dir = output_dir_var.get() if output_dir_var.get() else None
+    output_format = OUTPUT_FORMAT_CHOICES[output_format_var.get()]
+    compression = compression_var.get()
+    rule_pack = rule_pack_var.get()
+    processing_thread = threading.Thread(target=run_batch,
+                                         args=(list(selected_pdf_paths), output_dir, output_format, compression, rule_pack),
+                                         daemon=True)
     processing_thread.start()
     
     # Check thread status periodically
@@ -788,13 +2571,8 @@ def abort_conversion():
         if processing_thread and processing_thread.is_alive():
             processing_thread.join(timeout=1.0)  # Wait up to 1 second
             
-        # Clear queue
-        while not conversion_queue.empty():
-            try:
-                conversion_queue.get_nowait()
-                conversion_queue.task_done()
-            except queue.Empty:
-                break
+        # Clear queue; dropped files did not wait to be converted, so no wait is recorded
+        conversion_queue.clear()
                 
         # Update UI
         select_button.config(state=NORMAL)
@@ -806,6 +2584,8 @@ def select_files():
     """Select PDF files for conversion"""
     global selected_pdf_paths
     selected_pdf_paths.clear()
+    selected_page_counts.clear()
+    file_priorities.clear()
     file_listbox.delete(0, tk.END)
     status_label.config(text="")
 
@@ -830,6 +2610,7 @@ def select_files():
             continue
             
         # Try to open with pdfplumber to validate
+        import pdfplumber
         try:
             with pdfplumber.open(path) as pdf:
                 page_count = len(pdf.pages)
@@ -842,6 +2623,7 @@ def select_files():
             
         # If all checks pass, add to list
         selected_pdf_paths.append(path)
+        selected_page_counts[path] = page_count
         file_listbox.insert(tk.END, os.path.basename(path))
 
     if selected_pdf_paths:
@@ -869,7 +2651,33 @@ def create_config():
             "log_level": "INFO",
             "max_threads": 1,
             "auto_verify": True,
-            "backup_files": True
+            "backup_files": True,
+            "service_port": 8765,
+            "service_max_pending": 16,
+            "metrics_port": 0,
+            "reflow_paragraphs": True,
+            "output_format": "docx",
+            "search_index_path": "",
+            "search_index_journal_mode": "delete",
+            "detect_duplicates": False,
+            "duplicate_threshold": 0.8,
+            "ocr_enabled": True,
+            "ocr_dpi": 300,
+            "ocr_language": "eng",
+            "ocr_workers": 0,
+            "ocr_cache_dir": "ocr_cache",
+            "broker_lease_seconds": 120,
+            "broker_poll_seconds": 5,
+            "broker_max_attempts": 3,
+            "docx_compression": "default",
+            "docx_compress_threads": 0,
+            "docx_verify_from_memory": True,
+            "rule_pack": "builtin",
+            "rule_pack_dir": "rule_packs",
+            "rule_cache_dir": "rule_cache",
+            "remove_running_lines": True,
+            "running_line_min_pages": 3,
+            "running_line_min_fraction": 0.5
         }
         with open(config_path, 'w') as f:
             json.dump(default_config, f, indent=4)
@@ -887,14 +2695,40 @@ def create_config():
                 "log_level": "INFO",
                 "max_threads": 1,
                 "auto_verify": True,
-                "backup_files": True
+                "backup_files": True,
+                "service_port": 8765,
+                "service_max_pending": 16,
+                "metrics_port": 0,
+                "reflow_paragraphs": True,
+                "output_format": "docx",
+                "search_index_path": "",
+                "search_index_journal_mode": "delete",
+                "detect_duplicates": False,
+                "duplicate_threshold": 0.8,
+                "ocr_enabled": True,
+                "ocr_dpi": 300,
+                "ocr_language": "eng",
+                "ocr_workers": 0,
+                "ocr_cache_dir": "ocr_cache",
+                "broker_lease_seconds": 120,
+                "broker_poll_seconds": 5,
+                "broker_max_attempts": 3,
+                "docx_compression": "default",
+                "docx_compress_threads": 0,
+                "docx_verify_from_memory": True,
+                "rule_pack": "builtin",
+                "rule_pack_dir": "rule_packs",
+                "rule_cache_dir": "rule_cache",
+                "remove_running_lines": True,
+                "running_line_min_pages": 3,
+                "running_line_min_fraction": 0.5
             }
 
 def show_about():
     """Show about dialog with version and credits"""
     messagebox.showinfo(
         "About PDF to Structured DOCX Converter",
-        "PDF to Structured DOCX Converter v2.0\n\n"
+        f"PDF to Structured DOCX Converter v{APP_VERSION}\n\n"
         "This application converts PDF documents to structured DOCX format "
         "with proper heading hierarchy and formatting.\n\n"
         "© 2025 All Rights Reserved\n\n"
@@ -908,11 +2742,16 @@ def show_help():
         "How to use this application:\n\n"
         "1. Click 'Select PDF Files' to choose one or more PDF files for conversion.\n"
         "2. Optionally select an output directory (defaults to same location as PDF).\n"
-        "3. Click 'Convert to DOCX' to start the conversion process.\n"
+        "3. Choose the output format (DOCX, Markdown, HTML or JSON) and click 'Convert' to start the conversion process.\n"
+        "   For DOCX, the compression level trades file size for saving speed (store is fastest).\n"
+        "   Rules picks the heading rules: builtin, auto (detected from the first page) or a rule pack.\n"
         "4. Monitor progress in the status area below.\n"
         "5. Green entries indicate successful conversion.\n"
         "6. Orange entries indicate successful conversion with verification warnings.\n"
-        "7. Red entries indicate failed conversion.\n\n"
+        "7. Red entries indicate failed conversion.\n"
+        "8. Gray entries are near-duplicates of another selected file and are not converted.\n"
+        "9. Right-click files to make them urgent or bulk; urgent files are converted first, even\n"
+        "   when they are already queued.\n\n"
         "For each converted file, a report file is generated with details of the conversion process."
     )
 
@@ -937,91 +2776,752 @@ def on_closing():
     else:
         root.destroy()
 
-# Create the main window with improved design
-root = tk.Tk()
-root.title("PDF to Structured DOCX Converter v2.0")
-root.geometry("800x600")
-root.minsize(700, 500)
-root.protocol("WM_DELETE_WINDOW", on_closing)
-
-# Load configuration
-config = create_config()
-
-# Create main frames
-top_frame = Frame(root, padx=10, pady=10)
-top_frame.pack(fill=tk.X)
-
-file_frame = Frame(root, padx=10, pady=5)
-file_frame.pack(fill=tk.BOTH, expand=True)
-
-status_frame = Frame(root, padx=10, pady=10)
-status_frame.pack(fill=tk.X, side=tk.BOTTOM)
-
-# Create menu bar
-menu_bar = tk.Menu(root)
-root.config(menu=menu_bar)
-
-file_menu = tk.Menu(menu_bar, tearoff=0)
-menu_bar.add_cascade(label="File", menu=file_menu)
-file_menu.add_command(label="Select PDF Files", command=select_files)
-file_menu.add_command(label="Select Output Directory", command=select_output_dir)
-file_menu.add_separator()
-file_menu.add_command(label="Exit", command=on_closing)
-
-tools_menu = tk.Menu(menu_bar, tearoff=0)
-menu_bar.add_cascade(label="Tools", menu=tools_menu)
-tools_menu.add_command(label="View Log File", command=show_log)
-
-help_menu = tk.Menu(menu_bar, tearoff=0)
-menu_bar.add_cascade(label="Help", menu=help_menu)
-help_menu.add_command(label="User Guide", command=show_help)
-help_menu.add_command(label="About", command=show_about)
-
-# Create buttons in top frame
-select_button = ttk.Button(top_frame, text="Select PDF Files", command=select_files)
-select_button.pack(side=tk.LEFT, padx=5)
-
-convert_button = ttk.Button(top_frame, text="Convert to DOCX", command=start_processing, state=DISABLED)
-convert_button.pack(side=tk.LEFT, padx=5)
-
-abort_button = ttk.Button(top_frame, text="Abort Conversion", command=abort_conversion, state=DISABLED)
-abort_button.pack(side=tk.LEFT, padx=5)
-
-output_dir_var = tk.StringVar(value=config.get("default_output_dir", ""))
-output_button = ttk.Button(top_frame, text="Select Output Directory", command=select_output_dir)
-output_button.pack(side=tk.LEFT, padx=5)
-
-output_dir_label = ttk.Label(top_frame, text="Output: Default (same as PDF)")
-if output_dir_var.get():
-    output_dir_label.config(text=f"Output: {output_dir_var.get()}")
-output_dir_label.pack(side=tk.LEFT, padx=5)
-
-# Create file listbox with scrollbar
-file_listbox_label = ttk.Label(file_frame, text="Files to Process:")
-file_listbox_label.pack(anchor=tk.W)
-
-file_list_frame = Frame(file_frame)
-file_list_frame.pack(fill=tk.BOTH, expand=True)
-
-scrollbar = ttk.Scrollbar(file_list_frame)
-scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+# ---------------------------------------------------------------------------
+# Conversion service: local HTTP API around convert_pdf_to_docx
+# ---------------------------------------------------------------------------
+
+SERVICE_CHUNK_SIZE = 64 * 1024  # Uploads and downloads are streamed in chunks of this size
+service_jobs_dir = "service_jobs"
+service_jobs = {}  # job_id -> job state, only touched from the event loop thread
+service_pool = None
+service_max_pending = 16
+
+SERVICE_CONTENT_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "markdown": "text/markdown; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "json": "application/json"
+}
+HTTP_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 411: "Length Required",
+    500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+def init_service_worker(log_path, index_path, worker_config, pool_workers=1):
+    """Set up a worker process of the conversion service
+
+    The configuration is passed in because spawned workers (Windows, macOS)
+    do not run main() and would otherwise only see the defaults.
+    """
+    global search_index_path, config
+    setup_logging(log_path)
+    search_index_path = index_path
+    config = dict(worker_config)
+    # Each worker starts its own OCR pool; split the CPUs between them rather than running workers x CPUs Tesseracts
+    ocr_share = max(1, (os.cpu_count() or 1) // max(1, pool_workers))
+    config["ocr_workers"] = min(config.get("ocr_workers", 0) or ocr_share, ocr_share)
+
+def convert_and_report(pdf_path, output_dir=None, output_format="docx", compression=None, rule_pack=None):
+    """Convert and verify one PDF; returns the results and the conversion report"""
+    output_path, status_msg, doc_stats = convert_pdf(pdf_path, output_dir, output_format,
+                                                     reflow=config.get("reflow_paragraphs", True),
+                                                     compression=compression, rule_pack=rule_pack)
+    is_valid, verify_msg = False, None
+    if output_path:
+        verify_started = time.time()
+        is_valid, verify_msg = verify_output_integrity(output_path, doc_stats)
+        doc_stats["timings"]["verify"] = time.time() - verify_started
+    report = build_conversion_report(pdf_path, output_path, status_msg, doc_stats, is_valid, verify_msg)
+    return output_path, status_msg, doc_stats, is_valid, verify_msg, report
+
+def run_conversion_job(pdf_path, output_dir, output_format="docx", compression=None, rule_pack=None):
+    """Convert, verify and report one PDF; runs in a worker process of the service
+
+    Also returns the worker's process id and peak memory, which the service
+    exports because /metrics is served from the parent process.
+    """
+    output_path, status_msg, doc_stats, is_valid, verify_msg, report = convert_and_report(
+        pdf_path, output_dir, output_format, compression, rule_pack)
+    with open(os.path.join(output_dir, "report.json"), 'w') as f:
+        json.dump(report, f, indent=4)
+    return output_path, status_msg, doc_stats, is_valid, verify_msg, os.getpid(), get_process_peak_memory()
+
+def count_pending_service_jobs():
+    """Count jobs that are uploading, queued or running"""
+    return sum(1 for job in service_jobs.values() if job["status"] in ("uploading", "queued", "running"))
+
+def service_job_summary(job_id):
+    """Public view of a job for status responses"""
+    job = service_jobs[job_id]
+    summary = {
+        "job_id": job_id,
+        "filename": job["filename"],
+        "status": job["status"],
+        "message": job["message"],
+        "priority": job["priority"],
+        "compression": job["compression"],
+        "rule_pack": job["rule_pack"],
+        "submitted": job["submitted"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "links": {"status": f"/jobs/{job_id}"}
+    }
+    if job["output_path"]:
+        summary["links"]["output"] = f"/jobs/{job_id}/output"
+    if job["status"] in ("success", "warning", "error"):
+        summary["links"]["report"] = f"/jobs/{job_id}/report"
+    return summary
+
+async def send_service_response(writer, status, body=b"", content_type="application/json", headers=None):
+    """Write a complete HTTP response with an in-memory body"""
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, indent=4).encode('utf-8')
+    head = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close"]
+    for name, value in (headers or {}).items():
+        head.append(f"{name}: {value}")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+def clean_service_filename(filename):
+    """File name of an upload without directories, control characters or quotes"""
+    filename = os.path.basename(filename.replace("\\", "/"))
+    filename = re.sub(r'[\x00-\x1f\x7f"]', '', filename).strip()
+    return filename or "document.pdf"
+
+def format_content_disposition(download_name):
+    """Content-Disposition header value with an ASCII fallback and the UTF-8 name (RFC 6266)"""
+    import unicodedata
+    import urllib.parse
+    stem, extension = os.path.splitext(download_name)
+    ascii_stem = unicodedata.normalize('NFKD', stem).encode('ascii', 'ignore').decode('ascii')
+    ascii_stem = re.sub(r'[^\w.\- ]', '_', ascii_stem).strip() or "document"
+    ascii_name = ascii_stem + re.sub(r'[^\w.]', '', extension)
+    return f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{urllib.parse.quote(download_name, safe="")}'
+
+async def send_service_file(writer, file_path, content_type, download_name):
+    """Stream a file to the client without loading it into memory"""
+    head = ["HTTP/1.1 200 OK",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {os.path.getsize(file_path)}",
+            f"Content-Disposition: {format_content_disposition(download_name)}",
+            "Connection: close"]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(SERVICE_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()  # Waits while the client is slower than the disk
+
+async def receive_service_upload(reader, headers, job_id, filename):
+    """Stream a request body to the job directory and queue the job"""
+    job_dir = os.path.join(service_jobs_dir, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    pdf_path = os.path.join(job_dir, filename)
+    remaining = int(headers["content-length"])
+    with open(pdf_path, 'wb') as f:
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, SERVICE_CHUNK_SIZE))
+            if not chunk:
+                raise ConnectionError("Client closed the connection during upload")
+            f.write(chunk)
+            remaining -= len(chunk)
+    job = service_jobs[job_id]
+    job.update({"status": "queued", "message": "Waiting for a worker", "pdf_path": pdf_path})
+    await service_job_queue.put((job_id, job["priority"], job["submitter"]))
+
+async def service_dispatcher():
+    """Feed queued jobs to the process pool, one job at a time per pool worker"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    while True:
+        job_id = await service_job_queue.get()
+        job = service_jobs.get(job_id)
+        if job is None:  # Deleted while queued
+            continue
+        job.update({"status": "running", "message": "Converting", "started": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        try:
+            output_path, status_msg, doc_stats, is_valid, verify_msg, worker_pid, peak_memory = await loop.run_in_executor(
+                service_pool, run_conversion_job, job["pdf_path"], os.path.dirname(job["pdf_path"]), job["output_format"],
+                job["compression"], job["rule_pack"])
+            status = "error" if not output_path else "success" if is_valid else "warning"
+            job.update({"status": status, "message": verify_msg or status_msg, "output_path": output_path})
+            # Pages were counted in the worker process; count them here for this registry
+            record_pages_processed(doc_stats["pages_processed"])
+            record_conversion_metrics(output_path, status_msg, doc_stats, is_valid)
+            if peak_memory is not None:
+                metrics_set("pdf_converter_worker_peak_memory_bytes", peak_memory, worker=str(worker_pid))
+        except Exception as e:
+            log_error(f"Service job {job_id} failed", e)
+            job.update({"status": "error", "message": str(e)})
+            metrics_inc("pdf_converter_files_processed_total", status="error")
+            metrics_inc("pdf_converter_failures_total", reason="conversion_error")
+        job["finished"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+async def route_service_request(method, path, query, headers, reader, writer):
+    """Dispatch one HTTP request of the conversion service"""
+    import uuid
+    parts = [part for part in path.split("/") if part]
+    
+    if parts == ["jobs"] and method == "POST":
+        if "content-length" not in headers:
+            return await send_service_response(writer, 411, {"error": "Content-Length is required"})
+        # Backpressure: refuse before reading the body so the client can retry later
+        if count_pending_service_jobs() >= service_max_pending:
+            return await send_service_response(writer, 503, {"error": "Too many pending jobs"},
+                                               headers={"Retry-After": "5"})
+        filename = clean_service_filename(query.get("filename", ["document.pdf"])[0])
+        if not filename.lower().endswith(".pdf"):
+            filename += ".pdf"
+        output_format = query.get("format", ["docx"])[0]
+        if output_format not in OUTPUT_FORMATS:
+            return await send_service_response(writer, 400, {"error": f"Unknown format, use one of {list(OUTPUT_FORMATS)}"})
+        compression = query.get("compression", [None])[0]
+        if compression is not None and compression not in DOCX_COMPRESSION_LEVELS:
+            return await send_service_response(writer, 400, {"error": f"Unknown compression, use one of {list(DOCX_COMPRESSION_LEVELS)}"})
+        # Only packs of rule_pack_dir by name: clients must not make the service read arbitrary files
+        rule_pack = query.get("rule_pack", [None])[0]
+        rule_pack_choices = list_rule_pack_choices()
+        if rule_pack is not None and rule_pack not in rule_pack_choices:
+            return await send_service_response(writer, 400, {"error": f"Unknown rule pack, use one of {rule_pack_choices}"})
+        priority = query.get("priority", ["normal"])[0]
+        if priority not in QUEUE_PRIORITIES:
+            return await send_service_response(writer, 400, {"error": f"Unknown priority, use one of {list(QUEUE_PRIORITIES)}"})
+        # Submitters take turns within a priority; by default each client address is one submitter
+        submitter = query.get("submitter", [None])[0] or (writer.get_extra_info("peername") or ("unknown",))[0]
+        job_id = uuid.uuid4().hex
+        service_jobs[job_id] = {
+            "filename": filename, "status": "uploading", "message": "Receiving upload",
+            "pdf_path": None, "output_path": None, "output_format": output_format, "compression": compression,
+            "rule_pack": rule_pack,
+            "priority": priority, "submitter": submitter,
+            "submitted": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "started": None, "finished": None
+        }
+        try:
+            await receive_service_upload(reader, headers, job_id, filename)
+        except Exception as e:
+            log_error(f"Upload of service job {job_id} failed", e)
+            service_jobs.pop(job_id, None)
+            shutil.rmtree(os.path.join(service_jobs_dir, job_id), ignore_errors=True)
+            return await send_service_response(writer, 400, {"error": f"Upload failed: {str(e)}"})
+        return await send_service_response(writer, 202, service_job_summary(job_id))
+    
+    if parts == ["metrics"] and method == "GET":
+        return await send_service_response(writer, 200, render_metrics().encode('utf-8'),
+                                           content_type="text/plain; version=0.0.4; charset=utf-8")
+    
+    if parts == ["jobs"] and method == "GET":
+        return await send_service_response(writer, 200, [service_job_summary(job_id) for job_id in service_jobs])
+    
+    if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in service_jobs:
+        return await send_service_response(writer, 404, {"error": "Not found"})
+    job_id = parts[1]
+    job = service_jobs[job_id]
+    
+    if len(parts) == 2 and method == "GET":
+        return await send_service_response(writer, 200, service_job_summary(job_id))
+    if len(parts) == 2 and method == "DELETE":
+        if job["status"] == "running":
+            return await send_service_response(writer, 409, {"error": "Job is running"})
+        service_jobs.pop(job_id)
+        shutil.rmtree(os.path.join(service_jobs_dir, job_id), ignore_errors=True)
+        return await send_service_response(writer, 200, {"job_id": job_id, "status": "deleted"})
+    # /docx is kept for clients written before other output formats existed
+    if len(parts) == 3 and method == "GET" and parts[2] in ("output", "docx"):
+        if not job["output_path"]:
+            return await send_service_response(writer, 409, {"error": f"No document available, job is {job['status']}"})
+        return await send_service_file(writer, job["output_path"], SERVICE_CONTENT_TYPES[job["output_format"]],
+                                       os.path.basename(job["output_path"]))
+    if len(parts) == 3 and method == "GET" and parts[2] == "report":
+        report_path = os.path.join(service_jobs_dir, job_id, "report.json")
+        if not os.path.exists(report_path):
+            return await send_service_response(writer, 409, {"error": f"No report available, job is {job['status']}"})
+        return await send_service_file(writer, report_path, "application/json", "report.json")
+    
+    return await send_service_response(writer, 405, {"error": "Method not allowed"})
 
-file_listbox = tk.Listbox(file_list_frame, yscrollcommand=scrollbar.set, selectmode=tk.EXTENDED, font=("Courier", 10))
-file_listbox.pack(fill=tk.BOTH, expand=True)
-scrollbar.config(command=file_listbox.yview)
+async def handle_service_connection(reader, writer):
+    """Parse an HTTP/1.1 request and route it; one request per connection"""
+    import urllib.parse
+    try:
+        request_line = await reader.readline()
+        if not request_line:
+            return
+        method, target, _ = request_line.decode('latin-1').split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        path, _, query = target.partition("?")
+        await route_service_request(method.upper(), path, urllib.parse.parse_qs(query), headers, reader, writer)
+    except Exception as e:
+        log_error("Failed to handle service request", e)
+        try:
+            await send_service_response(writer, 500, {"error": str(e)})
+        except Exception:
+            pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+async def serve_conversions(host, port, workers):
+    """Run the conversion service until cancelled"""
+    import asyncio
+    global service_job_queue
+    
+    class FairJobQueue(asyncio.Queue):
+        """asyncio queue of job ids served by priority and submitter; see FairQueueLanes"""
+        def _init(self, maxsize):
+            self._queue = FairQueueLanes("service")
+    
+    service_job_queue = FairJobQueue()
+    dispatchers = [asyncio.create_task(service_dispatcher()) for _ in range(workers)]
+    server = await asyncio.start_server(handle_service_connection, host, port)
+    logging.info(f"Conversion service listening on http://{host}:{port} with {workers} worker(s)")
+    print(f"Conversion service listening on http://{host}:{port} with {workers} worker(s)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in dispatchers:
+            task.cancel()
+
+def run_service(host="127.0.0.1", port=8765, workers=1, max_pending=16):
+    """Start the conversion service with a bounded process pool behind it"""
+    import asyncio
+    import concurrent.futures
+    
+    global service_pool, service_max_pending
+    service_max_pending = max_pending
+    os.makedirs(service_jobs_dir, exist_ok=True)
+    # Workers log to the same file and feed the same search index as the service
+    service_pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=init_service_worker, initargs=(log_file, search_index_path, config, workers))
+    try:
+        asyncio.run(serve_conversions(host, port, workers))
+    except KeyboardInterrupt:
+        logging.info("Conversion service stopped")
+    finally:
+        service_pool.shutdown(cancel_futures=True)
+
+# ---------------------------------------------------------------------------
+# Job broker: a shared SQLite database that conversion workers pull jobs from
+# ---------------------------------------------------------------------------
+
+BROKER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    pdf_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL DEFAULT '',
+    output_format TEXT NOT NULL DEFAULT 'docx',
+    est_cost REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    submitted REAL,
+    started REAL,
+    finished REAL,
+    output_path TEXT,
+    message TEXT,
+    report TEXT,
+    priority INTEGER NOT NULL DEFAULT 1,
+    submitter TEXT NOT NULL DEFAULT '',
+    compression TEXT,
+    rule_pack TEXT,
+    UNIQUE (pdf_path, output_dir, output_format)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, est_cost);
+"""
+
+def open_broker(broker_path):
+    """Open (and create if needed) the job broker database"""
+    # Default rollback journal rather than WAL: WAL needs shared memory, which network mounts lack
+    connection = sqlite3.connect(broker_path, timeout=60, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(BROKER_SCHEMA)
+    # Brokers created before jobs had priorities and per-job settings
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+    for column, definition in (("priority", "INTEGER NOT NULL DEFAULT 1"), ("submitter", "TEXT NOT NULL DEFAULT ''"),
+                               ("compression", "TEXT"), ("rule_pack", "TEXT")):
+        if column not in columns:
+            connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+    return connection
+
+def submit_broker_jobs(broker_path, pdf_paths, output_dir=None, output_format="docx", priority="normal",
+                       submitter=None, compression=None, rule_pack=None):
+    """Queue PDFs on the broker and return how many were queued
+
+    Paths are stored absolute, so the shared mount must have the same path
+    on every worker. Submitting a file again re-queues its finished job and
+    raises the priority of a queued one; running jobs are left alone.
+    Without a compression level or rule pack, workers use their own
+    docx_compression and rule_pack; a rule pack is looked up by name in
+    each worker's rule_pack_dir.
+    """
+    import getpass
+    import pdfplumber
+    if priority not in QUEUE_PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}, use one of {', '.join(QUEUE_PRIORITIES)}")
+    if compression is not None and compression not in DOCX_COMPRESSION_LEVELS:
+        raise ValueError(f"Unknown compression {compression!r}, use one of {', '.join(DOCX_COMPRESSION_LEVELS)}")
+    rank = QUEUE_PRIORITIES.index(priority)
+    submitter = submitter or getpass.getuser()
+    rows = []
+    for pdf_path in pdf_paths:
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                page_count = len(pdf.pages)
+        except Exception as e:
+            log_error(f"Could not count pages of {pdf_path}", e)
+            page_count = 0
+        rows.append((os.path.abspath(pdf_path), os.path.abspath(output_dir) if output_dir else "", output_format,
+                     estimate_conversion_cost(page_count), time.time(), rank, submitter, compression, rule_pack))
+    
+    connection = open_broker(broker_path)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        cursor = connection.executemany("""
+            INSERT INTO jobs (pdf_path, output_dir, output_format, est_cost, submitted, priority, submitter, compression,
+                              rule_pack)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (pdf_path, output_dir, output_format) DO UPDATE SET
+                status = 'queued', est_cost = excluded.est_cost, submitted = excluded.submitted, attempts = 0,
+                worker = NULL, lease_expires = NULL, started = NULL, finished = NULL,
+                output_path = NULL, message = NULL, report = NULL,
+                priority = excluded.priority, submitter = excluded.submitter, compression = excluded.compression,
+                rule_pack = excluded.rule_pack
+            WHERE jobs.status NOT IN ('queued', 'running')
+        """, rows)
+        queued = cursor.rowcount
+        connection.executemany("""
+            UPDATE jobs SET priority = ?, submitter = ?
+            WHERE pdf_path = ? AND output_dir = ? AND output_format = ? AND status = 'queued' AND priority > ?
+        """, [(rank, submitter, pdf_path, job_output_dir, job_format, rank)
+              for pdf_path, job_output_dir, job_format, *_ in rows])
+        connection.execute("COMMIT")
+        return queued
+    finally:
+        connection.close()
+
+def claim_broker_job(connection, worker_id, lease_seconds, max_attempts=3):
+    """Lease the next waiting job to a worker; None when nothing is waiting
+
+    Jobs are taken by priority, then from the submitter with the fewest
+    running jobs (so submitters share the workers), then most expensive
+    first. Running jobs whose lease expired (their worker died or hung) are
+    waiting again, until they have been attempted max_attempts times.
+    """
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("""
+            UPDATE jobs SET status = 'error', finished = ?,
+                message = 'Worker lost ' || attempts || ' time(s); giving up'
+            WHERE status = 'running' AND lease_expires < ? AND attempts >= ?
+        """, (now, now, max_attempts))
+        job = connection.execute("""
+            WITH busy AS (
+                SELECT submitter, COUNT(*) AS running FROM jobs
+                WHERE status = 'running' AND lease_expires >= ? GROUP BY submitter
+            )
+            SELECT jobs.* FROM jobs LEFT JOIN busy USING (submitter)
+            WHERE jobs.status = 'queued' OR (jobs.status = 'running' AND jobs.lease_expires < ?)
+            ORDER BY jobs.priority, COALESCE(busy.running, 0), jobs.est_cost DESC, jobs.id LIMIT 1
+        """, (now, now)).fetchone()
+        if job is not None:
+            connection.execute("""
+                UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, lease_expires = ?, started = ?
+                WHERE id = ?
+            """, (worker_id, now + lease_seconds, now, job["id"]))
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    if job is None:
+        return None
+    # The worker and attempt number identify this lease; a reassigned job has another
+    return dict(job, worker=worker_id, attempts=job["attempts"] + 1)
+
+def renew_broker_lease(connection, job, lease_seconds):
+    """Extend a job's lease; False when the lease was lost to another worker"""
+    cursor = connection.execute("""
+        UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'
+    """, (time.time() + lease_seconds, job["id"], job["worker"], job["attempts"]))
+    return cursor.rowcount == 1
+
+def complete_broker_job(connection, job, report):
+    """Store a job's result and report; False when the lease was lost meanwhile"""
+    cursor = connection.execute("""
+        UPDATE jobs SET status = ?, finished = ?, output_path = ?, message = ?, report = ?, lease_expires = NULL
+        WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running'
+    """, (report["status"], time.time(), report.get("output_file"),
+          report.get("error_message") or report.get("warning_message") or "Success", json.dumps(report),
+          job["id"], job["worker"], job["attempts"]))
+    return cursor.rowcount == 1
+
+def broker_heartbeat(broker_path, job, lease_seconds, stop_event):
+    """Renew a job's lease until stop_event is set (runs on its own thread)"""
+    connection = open_broker(broker_path)
+    try:
+        while not stop_event.wait(lease_seconds / 3):
+            try:
+                if not renew_broker_lease(connection, job, lease_seconds):
+                    logging.warning(f"Lease on job {job['id']} was lost; its result will be discarded")
+                    return
+            except sqlite3.Error as e:
+                # Busy or briefly unreachable broker; try again on the next beat
+                log_error(f"Failed to renew lease on job {job['id']}", e)
+    finally:
+        connection.close()
+
+def run_broker_job(broker_path, job, lease_seconds):
+    """Convert a leased job while keeping its lease alive; returns the report"""
+    stop_event = threading.Event()
+    heartbeat = threading.Thread(target=broker_heartbeat, args=(broker_path, job, lease_seconds, stop_event),
+                                 daemon=True)
+    heartbeat.start()
+    try:
+        # Outputs are written to a temporary file and moved into place, so a
+        # job run twice after a lost lease just replaces the file atomically
+        return convert_and_report(job["pdf_path"], job["output_dir"] or None, job["output_format"],
+                                  job["compression"], job["rule_pack"])[-1]
+    except Exception as e:
+        log_error(f"Failed to process broker job {job['id']}: {job['pdf_path']}", e)
+        return build_conversion_report(job["pdf_path"], None, f"Conversion error: {str(e)}", new_document_stats())
+    finally:
+        stop_event.set()
+        heartbeat.join()
+
+def broker_worker_loop(broker_path, exit_when_idle=False):
+    """Claim and convert broker jobs until none is left (or forever); returns jobs completed"""
+    import socket
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    lease_seconds = config.get("broker_lease_seconds", 120)
+    poll_seconds = config.get("broker_poll_seconds", 5)
+    max_attempts = config.get("broker_max_attempts", 3)
+    completed = 0
+    
+    connection = open_broker(broker_path)
+    try:
+        logging.info(f"Broker worker {worker_id} started on {broker_path}")
+        while True:
+            job = claim_broker_job(connection, worker_id, lease_seconds, max_attempts)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            
+            logging.info(f"Worker {worker_id} claimed job {job['id']} (attempt {job['attempts']}, "
+                         f"{QUEUE_PRIORITIES[job['priority']]}): {job['pdf_path']}")
+            report = run_broker_job(broker_path, job, lease_seconds)
+            if complete_broker_job(connection, job, report):
+                completed += 1
+                logging.info(f"Job {job['id']} finished: {report['status']}")
+            else:
+                logging.warning(f"Job {job['id']} was reassigned while converting; result discarded")
+    finally:
+        connection.close()
+    return completed
+
+def run_broker_workers(broker_path, workers=1, exit_when_idle=False):
+    """Run broker workers in this process, or in a process pool for several"""
+    import concurrent.futures
+    if workers <= 1:
+        try:
+            broker_worker_loop(broker_path, exit_when_idle)
+        except KeyboardInterrupt:
+            logging.info("Broker worker stopped")
+        return
+    
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=init_service_worker, initargs=(log_file, search_index_path, config, workers))
+    try:
+        futures = [pool.submit(broker_worker_loop, broker_path, exit_when_idle) for _ in range(workers)]
+        completed = sum(future.result() for future in futures)
+        logging.info(f"Broker workers completed {completed} job(s)")
+    except KeyboardInterrupt:
+        logging.info("Broker workers stopped")
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def broker_status(broker_path):
+    """Count the broker's jobs by status and list the running ones"""
+    connection = open_broker(broker_path)
+    try:
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        running = [dict(row) for row in connection.execute("""
+            SELECT id, pdf_path, worker, attempts, started, lease_expires FROM jobs
+            WHERE status = 'running' ORDER BY started
+        """)]
+        # Time from submission to the (last) start, by priority
+        waits = {QUEUE_PRIORITIES[row["priority"]]: dict(row) for row in connection.execute("""
+            SELECT priority, COUNT(*) AS count, AVG(started - submitted) AS mean, MAX(started - submitted) AS longest
+            FROM jobs WHERE started IS NOT NULL GROUP BY priority ORDER BY priority
+        """)}
+        return counts, running, waits
+    finally:
+        connection.close()
+
+def run_broker_status(broker_path):
+    """Print the broker's job counts and running jobs for --broker-status"""
+    counts, running, waits = broker_status(broker_path)
+    now = time.time()
+    print(", ".join(f"{status}: {counts.get(status, 0)}"
+                    for status in ("queued", "running", "success", "warning", "error")))
+    for priority, wait in waits.items():
+        print(f"    {priority}: {wait['count']} started, mean wait {format_duration(wait['mean'])}, "
+              f"longest {format_duration(wait['longest'])}")
+    for job in running:
+        lease = "expired" if job["lease_expires"] < now else f"lease {format_duration(job['lease_expires'] - now)}"
+        print(f"    #{job['id']} {os.path.basename(job['pdf_path'])} on {job['worker']} "
+              f"(attempt {job['attempts']}, {lease})")
+
+def collect_broker_reports(broker_path, report_path):
+    """Write the reports of all finished broker jobs into one JSON file"""
+    connection = open_broker(broker_path)
+    try:
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        reports = []
+        for row in connection.execute("""
+            SELECT * FROM jobs WHERE status IN ('success', 'warning', 'error') ORDER BY finished
+        """):
+            report = json.loads(row["report"]) if row["report"] else {
+                "source_file": row["pdf_path"], "status": row["status"], "error_message": row["message"]}
+            report["worker"] = row["worker"]
+            report["attempts"] = row["attempts"]
+            reports.append(report)
+    finally:
+        connection.close()
+    with open(report_path, 'w') as f:
+        json.dump({
+            "generated": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "jobs": counts,
+            "reports": reports
+        }, f, indent=4)
+    return len(reports)
+
+def build_gui():
+    """Create the main window with improved design"""
+    global tk, filedialog, messagebox, ttk, Frame, DISABLED, NORMAL
+    global root, select_button, convert_button, abort_button, output_dir_var, output_dir_label, output_format_var
+    global file_listbox, status_label, progress_bar, progress_label, priority_menu, compression_var, rule_pack_var
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, Frame, DISABLED, NORMAL
+    from tkinter import ttk
+    
+    root = tk.Tk()
+    root.title(f"PDF to Structured DOCX Converter v{APP_VERSION}")
+    root.geometry("800x600")
+    root.minsize(700, 500)
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+
+    # Create main frames
+    top_frame = Frame(root, padx=10, pady=10)
+    top_frame.pack(fill=tk.X)
+
+    file_frame = Frame(root, padx=10, pady=5)
+    file_frame.pack(fill=tk.BOTH, expand=True)
+
+    status_frame = Frame(root, padx=10, pady=10)
+    status_frame.pack(fill=tk.X, side=tk.BOTTOM)
+
+    # Create menu bar
+    menu_bar = tk.Menu(root)
+    root.config(menu=menu_bar)
+
+    file_menu = tk.Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="File", menu=file_menu)
+    file_menu.add_command(label="Select PDF Files", command=select_files)
+    file_menu.add_command(label="Select Output Directory", command=select_output_dir)
+    file_menu.add_separator()
+    file_menu.add_command(label="Exit", command=on_closing)
+
+    tools_menu = tk.Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="Tools", menu=tools_menu)
+    tools_menu.add_command(label="View Log File", command=show_log)
+
+    help_menu = tk.Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="Help", menu=help_menu)
+    help_menu.add_command(label="User Guide", command=show_help)
+    help_menu.add_command(label="About", command=show_about)
+
+    # Create buttons in top frame
+    select_button = ttk.Button(top_frame, text="Select PDF Files", command=select_files)
+    select_button.pack(side=tk.LEFT, padx=5)
+
+    convert_button = ttk.Button(top_frame, text="Convert", command=start_processing, state=DISABLED)
+    convert_button.pack(side=tk.LEFT, padx=5)
+
+    abort_button = ttk.Button(top_frame, text="Abort Conversion", command=abort_conversion, state=DISABLED)
+    abort_button.pack(side=tk.LEFT, padx=5)
+
+    output_dir_var = tk.StringVar(value=config.get("default_output_dir", ""))
+    output_button = ttk.Button(top_frame, text="Select Output Directory", command=select_output_dir)
+    output_button.pack(side=tk.LEFT, padx=5)
+
+    output_format_var = tk.StringVar(value=next(
+        (label for label, name in OUTPUT_FORMAT_CHOICES.items() if name == config.get("output_format", "docx")), "DOCX"))
+    output_format_box = ttk.Combobox(top_frame, textvariable=output_format_var, values=list(OUTPUT_FORMAT_CHOICES),
+                                     state="readonly", width=10)
+    output_format_box.pack(side=tk.LEFT, padx=5)
+
+    ttk.Label(top_frame, text="Compression:").pack(side=tk.LEFT)
+    compression_var = tk.StringVar(value=config.get("docx_compression", "default"))
+    compression_box = ttk.Combobox(top_frame, textvariable=compression_var, values=list(DOCX_COMPRESSION_LEVELS),
+                                   state="readonly", width=8)
+    compression_box.pack(side=tk.LEFT, padx=5)
+
+    ttk.Label(top_frame, text="Rules:").pack(side=tk.LEFT)
+    rule_pack_var = tk.StringVar(value=config.get("rule_pack", "builtin") or "builtin")
+    rule_pack_box = ttk.Combobox(top_frame, textvariable=rule_pack_var, values=list_rule_pack_choices(),
+                                 state="readonly", width=10)
+    rule_pack_box.pack(side=tk.LEFT, padx=5)
+
+    output_dir_label = ttk.Label(top_frame, text="Output: Default (same as PDF)")
+    if output_dir_var.get():
+        output_dir_label.config(text=f"Output: {output_dir_var.get()}")
+    output_dir_label.pack(side=tk.LEFT, padx=5)
+
+    # Create file listbox with scrollbar
+    file_listbox_label = ttk.Label(file_frame, text="Files to Process:")
+    file_listbox_label.pack(anchor=tk.W)
+
+    file_list_frame = Frame(file_frame)
+    file_list_frame.pack(fill=tk.BOTH, expand=True)
+
+    scrollbar = ttk.Scrollbar(file_list_frame)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    file_listbox = tk.Listbox(file_list_frame, yscrollcommand=scrollbar.set, selectmode=tk.EXTENDED, font=("Courier", 10))
+    file_listbox.pack(fill=tk.BOTH, expand=True)
+    scrollbar.config(command=file_listbox.yview)
+    
+    # Right-click sets the priority of the selected files, also while converting
+    priority_menu = tk.Menu(root, tearoff=0)
+    for priority in QUEUE_PRIORITIES:
+        priority_menu.add_command(label=f"Priority: {priority.capitalize()}",
+                                  command=lambda p=priority: set_file_priority(p))
+    file_listbox.bind("<Button-3>", show_priority_menu)
 
-# Create status indicators in status frame
-status_label = tk.Label(status_frame, text="", font=("Arial", 10))
-status_label.pack(anchor=tk.W)
+    # Create status indicators in status frame
+    status_label = tk.Label(status_frame, text="", font=("Arial", 10))
+    status_label.pack(anchor=tk.W)
 
-progress_frame = Frame(status_frame)
-progress_frame.pack(fill=tk.X, pady=5)
+    progress_frame = Frame(status_frame)
+    progress_frame.pack(fill=tk.X, pady=5)
 
-progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=100, mode='determinate')
-progress_bar.pack(fill=tk.X, side=tk.LEFT, expand=True)
+    progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=100, mode='determinate')
+    progress_bar.pack(fill=tk.X, side=tk.LEFT, expand=True)
 
-progress_label = ttk.Label(progress_frame, text="0%")
-progress_label.pack(side=tk.RIGHT, padx=5)
+    progress_label = ttk.Label(progress_frame, text="0%")
+    progress_label.pack(side=tk.RIGHT, padx=5)
+    
+    # Set up global exception handler
+    sys.excepthook = show_error
+    return root
 
 # Set up error handling for the entire application
 def show_error(exception_type, exception_value, exception_traceback):
@@ -1035,12 +3535,106 @@ def show_error(exception_type, exception_value, exception_traceback):
     logging.error("Full traceback:")
     logging.error(''.join(traceback.format_tb(exception_traceback)))
 
-# Set up global exception handler
-sys.excepthook = show_error
-
-# Start the main loop with better exception handling
-if __name__ == "__main__":
+def report_startup_time(probe_path):
+    """Record when the window is ready, for the startup benchmark, and quit"""
+    with open(probe_path, 'w') as f:
+        f.write(str(time.time()))
+    root.destroy()
+
+def main():
+    """Entry point: start the GUI, the conversion service with --serve, a broker worker
+    with --work, or run one of the --search and broker commands"""
+    global config, search_index_path
+    import argparse
+    
+    setup_logging()
+    
+    # Load configuration
+    config = create_config()
+    
+    parser = argparse.ArgumentParser(description="PDF to Structured DOCX Converter")
+    parser.add_argument("--serve", action="store_true", help="run the local HTTP conversion service instead of the GUI")
+    parser.add_argument("--host", default="127.0.0.1", help="service address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=config.get("service_port", 8765), help="service port")
+    parser.add_argument("--workers", type=int, default=config.get("max_threads", 1), help="conversion worker processes")
+    parser.add_argument("--max-pending", type=int, default=config.get("service_max_pending", 16),
+                        help="jobs accepted before new submissions are refused")
+    parser.add_argument("--metrics-port", type=int, default=config.get("metrics_port", 0),
+                        help="serve Prometheus metrics on this local port (0 disables)")
+    parser.add_argument("--index", default=config.get("search_index_path", ""),
+                        help="section search index to update during conversions and to search")
+    parser.add_argument("--search", metavar="PHRASE", nargs="?", const="",
+                        help="search the section index for a phrase and exit")
+    parser.add_argument("--section", help="with --search: only this section number, e.g. 12A")
+    parser.add_argument("--act", help="with --search: only Acts whose title matches")
+    parser.add_argument("--limit", type=int, default=20, help="with --search: maximum results")
+    parser.add_argument("--rule-pack",
+                        help='heading rules: "builtin", "auto" to detect from the first page, or a rule pack name/file '
+                             "(default: rule_pack); with --submit, stored with the jobs")
+    parser.add_argument("--compression", choices=list(DOCX_COMPRESSION_LEVELS),
+                        help="DOCX zip compression level (default: docx_compression); with --submit, "
+                             "stored with the jobs instead of using each worker's setting")
+    parser.add_argument("--broker", metavar="DB", help="shared SQLite job database for multi-node conversion")
+    parser.add_argument("--submit", metavar="PDF", nargs="+", help="with --broker: queue these PDFs and exit")
+    parser.add_argument("--output-dir", help="with --submit: where outputs go (default: beside each PDF)")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default=config.get("output_format", "docx"),
+                        help="with --submit: output format")
+    parser.add_argument("--priority", choices=QUEUE_PRIORITIES, default="normal", help="with --submit: job priority")
+    parser.add_argument("--submitter", help="with --submit: who the jobs are for (default: user name)")
+    parser.add_argument("--work", action="store_true", help="with --broker: convert queued jobs (see --workers)")
+    parser.add_argument("--exit-when-idle", action="store_true", help="with --work: stop once no job is queued")
+    parser.add_argument("--broker-status", action="store_true", help="with --broker: show job counts and exit")
+    parser.add_argument("--collect-reports", metavar="FILE",
+                        help="with --broker: write the reports of all finished jobs to FILE and exit")
+    args = parser.parse_args()
+    search_index_path = args.index or None
+    config["docx_compression"] = args.compression or config.get("docx_compression", "default")
+    config["rule_pack"] = args.rule_pack or config.get("rule_pack", "builtin")
+    
+    if (args.submit or args.work or args.broker_status or args.collect_reports) and not args.broker:
+        parser.error("--submit, --work, --broker-status and --collect-reports need --broker")
+    if args.submit:
+        queued = submit_broker_jobs(args.broker, args.submit, args.output_dir, args.format, args.priority, args.submitter,
+                                    args.compression, args.rule_pack)
+        print(f"Queued {queued} of {len(args.submit)} file(s)")
+        return
+    if args.broker_status:
+        run_broker_status(args.broker)
+        return
+    if args.collect_reports:
+        collected = collect_broker_reports(args.broker, args.collect_reports)
+        print(f"Wrote {collected} report(s) to {args.collect_reports}")
+        return
+    
+    if args.search is not None:
+        if not search_index_path or not os.path.exists(search_index_path):
+            parser.error("no search index; set search_index_path in the config or pass --index")
+        run_search(args)
+        return
+    
+    start_metrics_server(args.metrics_port)
+    
+    if args.work:
+        run_broker_workers(args.broker, max(args.workers, 1), args.exit_when_idle)
+        return
+    
+    if args.serve:
+        run_service(args.host, args.port, max(args.workers, 1), args.max_pending)
+        return
+    
+    build_gui()
+    # Set by benchmark.py to measure time-to-window of a build
+    probe_path = os.environ.get("PDF_CONVERTER_STARTUP_PROBE")
+    if probe_path:
+        root.after_idle(report_startup_time, probe_path)
     try:
         root.mainloop()
     except Exception as e:
-        log_error("Fatal error in main loop", e)
\ No newline at end of file
+        log_error("Fatal error in main loop", e)
+
+# Start the main loop with better exception handling
+if __name__ == "__main__":
+    # Pool children of the frozen Windows build must run their task, not another GUI or service
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
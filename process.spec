@@ -1,5 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# One-folder build without UPX: a onefile/UPX executable unpacks and
+# decompresses itself on every launch, which dominated startup time.
 
 a = Analysis(
     ['process.py'],
@@ -10,7 +12,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['numpy', 'pandas', 'pytest', '_pytest', 'setuptools', 'pkg_resources', 'IPython', 'matplotlib'],
     noarchive=False,
     optimize=0,
 )
@@ -19,16 +21,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='process',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +35,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='process',
+)